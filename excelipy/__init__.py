@@ -1,3 +1,6 @@
+import importlib
+from typing import TYPE_CHECKING, Any
+
 __all__ = [
     "Style",
     "Component",
@@ -10,23 +13,80 @@ __all__ = [
     "Sheet",
     "Excel",
     "save",
+    "plan_sheet",
+    "save_many",
+    "save_async",
     "row_wise",
+    "vectorized",
+    "cache_key",
     "unnest_components",
     "AI_GUIDE",
 ]
 
-from excelipy.const import AI_GUIDE
-from excelipy.models import (
-    Component,
-    Excel,
-    Fill,
-    Group,
-    Image,
-    Link,
-    Sheet,
-    Style,
-    Table,
-    Text,
-)
-from excelipy.service import save, unnest_components
-from excelipy.writers.table import row_wise
+# Public names by defining module, imported on first access so that
+# `import excelipy` stays cheap (pandas, pydantic, xlsxwriter and PIL load lazily)
+_LAZY_ATTRS = {
+    "AI_GUIDE": "excelipy.const",
+    "Component": "excelipy.models",
+    "Excel": "excelipy.models",
+    "Fill": "excelipy.models",
+    "Group": "excelipy.models",
+    "Image": "excelipy.models",
+    "Link": "excelipy.models",
+    "Sheet": "excelipy.models",
+    "Style": "excelipy.models",
+    "Table": "excelipy.models",
+    "Text": "excelipy.models",
+    "cache_key": "excelipy.cache",
+    "plan_sheet": "excelipy.service",
+    "save": "excelipy.service",
+    "save_async": "excelipy.service",
+    "save_many": "excelipy.service",
+    "unnest_components": "excelipy.service",
+    "row_wise": "excelipy.writers.table",
+    "vectorized": "excelipy.writers.table",
+}
+
+if TYPE_CHECKING:
+    from excelipy.cache import cache_key
+    from excelipy.const import AI_GUIDE
+    from excelipy.models import (
+        Component,
+        Excel,
+        Fill,
+        Group,
+        Image,
+        Link,
+        Sheet,
+        Style,
+        Table,
+        Text,
+    )
+    from excelipy.service import (
+        plan_sheet,
+        save,
+        save_async,
+        save_many,
+        unnest_components,
+    )
+    from excelipy.writers.table import row_wise, vectorized
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        # Submodules (`excelipy.models`, `excelipy.style`, ...) stay reachable
+        # as attributes, as they were when the package imported them eagerly
+        try:
+            return importlib.import_module(f"{__name__}.{name}")
+        except ModuleNotFoundError as e:
+            if e.name != f"{__name__}.{name}":
+                raise
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
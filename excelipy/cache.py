@@ -0,0 +1,302 @@
+"""
+Content-addressed cache of rendered workbooks. An `Excel` model is hashed from
+what ends up in the file (table data, image contents, styles and options), and
+its rendered bytes are kept in a directory, evicting the least recently used
+files above a size budget.
+"""
+
+import contextlib
+import datetime as dt
+import decimal
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+from types import CodeType
+from typing import Any, cast
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from excelipy.models import Excel, Group, Image, Link, Table
+from excelipy.sizing import (
+    DEFAULT_FONT_FAMILY,
+    DEFAULT_FONT_SIZE,
+    font_cache_key,
+    get_text_sizer,
+)
+from excelipy.sources import FileSource, TableSource
+
+log = logging.getLogger("excelipy")
+
+# Bumped when the hashed fields change, to invalidate existing entries
+CACHE_KEY_VERSION = 2
+
+# Creation date written in the document properties of cached workbooks, so
+# renders of the same model are byte-identical
+DETERMINISTIC_CREATED = dt.datetime(1980, 1, 1, tzinfo=dt.timezone.utc)
+
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+CACHE_KEY_ATTR = "_excelipy_cache_key"
+
+
+def _file_digest(path: str | os.PathLike) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(key: str) -> Callable[[Callable], Callable]:
+    """
+    Marks a StyleFunc as cacheable under `key`. The hash cannot see the globals
+    and helpers a StyleFunc depends on, so unmarked StyleFuncs make a model
+    uncacheable; change the key whenever the function's behaviour changes.
+
+    Examples:
+        >>> @cache_key("bold-ones-v1")
+        ... def bold_ones(value):
+        ...     return None
+        >>> _func_digest(bold_ones) is not None
+        True
+    """
+
+    def mark(func: Callable) -> Callable:
+        setattr(func, CACHE_KEY_ATTR, key)
+        return func
+
+    return mark
+
+
+def _const_digest(const: Any, digest: Any) -> None:
+    if isinstance(const, CodeType):
+        _code_digest(const, digest)
+    elif isinstance(const, tuple | frozenset):
+        items = const if isinstance(const, tuple) else sorted(const, key=repr)
+        digest.update(f"{type(const).__name__}({len(items)})".encode())
+        for item in items:
+            _const_digest(item, digest)
+    else:
+        digest.update(repr(const).encode() + b"\0")
+
+
+def _code_digest(code: CodeType, digest: Any) -> None:
+    # Nested code objects (lambdas, comprehensions) repr with their address, so
+    # they are hashed by content instead
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    _const_digest(code.co_consts, digest)
+
+
+def _func_digest(func: Callable) -> str | None:
+    """
+    StyleFuncs marked with `cache_key` are identified by their key, qualified
+    name, bytecode and decorator flags. Unmarked ones may depend on state the
+    hash cannot see, so they make a model uncacheable.
+    """
+    key = getattr(func, CACHE_KEY_ATTR, None)
+    code = getattr(func, "__code__", None)
+    if key is None or code is None:
+        return None
+    digest = hashlib.sha256()
+    flags = sorted(
+        (k, repr(v))
+        for k, v in getattr(func, "__dict__", {}).items()
+        if k.startswith("_excelipy_")
+    )
+    digest.update(repr((func.__module__, func.__qualname__, flags)).encode())
+    _code_digest(code, digest)
+    return digest.hexdigest()
+
+
+# Cell types whose repr is stable across processes, so object columns holding
+# only these (and Links) can be hashed cell by cell
+_STABLE_CELL_TYPES = (
+    str,
+    bytes,
+    int,
+    float,
+    complex,
+    decimal.Decimal,
+    dt.date,
+    dt.time,
+    dt.timedelta,
+    np.generic,
+    type(None),
+    type(pd.NA),
+    type(pd.NaT),
+)
+
+
+def _cell_key(cell: Any) -> str | None:
+    if isinstance(cell, Link):
+        return repr((type(cell).__qualname__, cell.url, cell.text))
+    if isinstance(cell, _STABLE_CELL_TYPES):
+        return repr((type(cell).__qualname__, cell))
+    return None
+
+
+def _is_object_column(dtype: Any) -> bool:
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    return isinstance(dtype, np.dtype) and dtype.kind == "O"
+
+
+def _package_version() -> str | None:
+    try:
+        return importlib.metadata.version("excelipy")
+    except importlib.metadata.PackageNotFoundError:
+        # Source checkouts rely on CACHE_KEY_VERSION alone
+        return None
+
+
+def _data_digest(data: pd.DataFrame | TableSource) -> str | None:
+    """
+    Object columns are hashed cell by cell with the type of each cell, since
+    `hash_pandas_object` hashes their text: a Link's URL, or 1 next to "1",
+    would not change the key.
+    """
+    if isinstance(data, FileSource):
+        return repr((data.to_spec(), _file_digest(data.path)))
+    if isinstance(data, TableSource):
+        return None
+    objects = [_is_object_column(dtype) for dtype in data.dtypes]
+    try:
+        rows = pd.util.hash_pandas_object(
+            data.iloc[:, [not obj for obj in objects]], index=True
+        ).to_numpy()
+    except TypeError:
+        return None
+    digest = hashlib.sha256(rows.tobytes())
+    digest.update(repr((list(data.columns), [str(t) for t in data.dtypes])).encode())
+    for col_idx in np.flatnonzero(objects).tolist():
+        for cell in data.iloc[:, col_idx]:
+            key = _cell_key(cell)
+            if key is None:
+                return None
+            digest.update(key.encode() + b"\0")
+    return digest.hexdigest()
+
+
+def _component_digest(component: Any) -> str | None:
+    if isinstance(component, Group):
+        parts = [component.model_dump_json(exclude={"components"})]
+        parts.extend(_component_digest(c) for c in component.components)
+        return None if None in parts else "\n".join(cast(list[str], parts))
+    if isinstance(component, Table):
+        exclude = {"data", "column_style", "idx_column_style"}
+        parts = [component.model_dump_json(exclude=exclude)]
+        parts.append(_data_digest(component.data))
+        for styles in (component.column_style, component.idx_column_style):
+            for key, style in styles.items():
+                parts.append(repr(key))
+                parts.append(
+                    _func_digest(style) if callable(style) else style.model_dump_json()
+                )
+        return None if None in parts else "\n".join(cast(list[str], parts))
+    if isinstance(component, Image):
+        return component.model_dump_json() + _file_digest(component.path)
+    return component.model_dump_json()
+
+
+def excel_digest(excel: Excel) -> str | None:
+    """
+    Content hash of everything written by the excel, or None when part of it
+    cannot be hashed (chunk iterators, StyleFuncs without a `cache_key`, data
+    pandas cannot hash, object cells other than Links and `_STABLE_CELL_TYPES`).
+    The output path is not part of the key.
+    """
+    digest = hashlib.sha256()
+    sizer = get_text_sizer()
+    header = {
+        "version": CACHE_KEY_VERSION,
+        "excelipy": _package_version(),
+        "xlsxwriter": xlsxwriter.__version__,
+        "sizer": [
+            f"{type(sizer).__module__}.{type(sizer).__qualname__}",
+            font_cache_key(DEFAULT_FONT_SIZE, DEFAULT_FONT_FAMILY),
+        ],
+        "options": excel.model_dump(mode="json", exclude={"path", "sheets"}),
+    }
+    digest.update(json.dumps(header, sort_keys=True).encode())
+    for sheet in excel.sheets:
+        digest.update(sheet.model_dump_json(exclude={"components"}).encode())
+        for component in sheet.components:
+            part = _component_digest(component)
+            if part is None:
+                log.debug(f"Sheet {sheet.name} cannot be cached: {component.name}")
+                return None
+            digest.update(b"\0" + part.encode())
+    return digest.hexdigest()
+
+
+class OutputCache:
+    """
+    Directory of rendered workbooks named by their `excel_digest`. Reading an
+    entry marks it as recently used; storing one evicts the least recently
+    used entries until the directory fits in `max_bytes`.
+
+    Examples:
+        >>> cache = OutputCache(tempfile.mkdtemp(), max_bytes=10)
+        >>> cache.put("a", b"12345")
+        >>> cache.put("b", b"6789")
+        >>> cache.get("a")
+        b'12345'
+        >>> cache.put("c", b"000")
+        >>> cache.get("b") is None, cache.get("a"), cache.get("c")
+        (True, b'12345', b'000')
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        max_bytes: int = DEFAULT_CACHE_SIZE,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.xlsx"
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # The modification time orders entries for eviction
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        self._evict()
+
+    def _evict(self) -> None:
+        with os.scandir(self.directory) as scan:
+            entries = [
+                (entry.stat(), entry.path)
+                for entry in scan
+                if entry.name.endswith(".xlsx") and entry.is_file()
+            ]
+        entries.sort(key=lambda entry: entry[0].st_mtime_ns)
+        total = sum(stat.st_size for stat, _ in entries)
+        # The newest entry is kept even when it is larger than the budget
+        for stat, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= stat.st_size
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
@@ -0,0 +1,134 @@
+"""
+Process-wide memoization caches (merged styles, fonts, glyph widths), each
+bounded to a configurable number of entries with least-recently-used eviction,
+and exposing hit/miss counters for monitoring.
+"""
+
+import contextlib
+import functools
+import threading
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+_caches: dict[str, "BoundedCache"] = {}
+_scope_lock = threading.Lock()
+_scope_depth = 0
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    name: str
+    hits: int
+    misses: int
+    size: int
+    # None when unbounded
+    maxsize: int | None
+
+    @property
+    def hit_rate(self) -> float:
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+
+class BoundedCache:
+    """
+    `functools.lru_cache` whose size can be changed at runtime, registered
+    under `name` so it shows up in `cache_stats`. Counters survive resizes.
+
+    Examples:
+        >>> square = BoundedCache(lambda x: x * x, "doctest_square", maxsize=2)
+        >>> [square(x) for x in (1, 2, 1, 3, 2)]
+        [1, 4, 1, 9, 4]
+        >>> info = square.cache_info()
+        >>> info.hits, info.misses, info.size, info.maxsize
+        (1, 4, 2, 2)
+        >>> del _caches["doctest_square"]
+    """
+
+    def __init__(self, func: Callable, name: str, maxsize: int | None):
+        functools.update_wrapper(self, func)
+        self.name = name
+        self._func = func
+        self._past_hits = 0
+        self._past_misses = 0
+        self._cached = functools.lru_cache(maxsize)(func)
+        _caches[name] = self
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self._cached(*args, **kwargs)
+
+    def __get__(self, instance: Any, owner: type | None = None) -> Any:
+        # Lets doctest and inspect treat the cache as a function
+        return self if instance is None else functools.partial(self, instance)
+
+    def resize(self, maxsize: int | None) -> None:
+        """
+        Replaces the cache with an empty one holding up to `maxsize` entries.
+        """
+        info = self._cached.cache_info()
+        self._past_hits += info.hits
+        self._past_misses += info.misses
+        self._cached = functools.lru_cache(maxsize)(self._func)
+
+    def cache_clear(self) -> None:
+        self.resize(self._cached.cache_info().maxsize)
+
+    def cache_info(self) -> CacheStats:
+        info = self._cached.cache_info()
+        return CacheStats(
+            name=self.name,
+            hits=self._past_hits + info.hits,
+            misses=self._past_misses + info.misses,
+            size=info.currsize,
+            maxsize=info.maxsize,
+        )
+
+
+def bounded_cache(name: str, maxsize: int | None) -> Callable[[Callable], BoundedCache]:
+    """
+    Decorator registering a function as the `BoundedCache` called `name`.
+    """
+    return lambda func: BoundedCache(func, name, maxsize)
+
+
+def cache_stats() -> dict[str, CacheStats]:
+    """
+    Hits, misses and size of every excelipy cache, by name.
+    """
+    return {name: cache.cache_info() for name, cache in _caches.items()}
+
+
+def set_cache_size(name: str, maxsize: int | None) -> None:
+    """
+    Bounds the cache called `name` (see `cache_stats`) to `maxsize` entries,
+    dropping its current entries. None lets it grow without limit.
+    """
+    try:
+        cache = _caches[name]
+    except KeyError:
+        raise KeyError(f"Unknown cache {name}, expected one of {list(_caches)}")
+    cache.resize(maxsize)
+
+
+def clear_caches() -> None:
+    for cache in _caches.values():
+        cache.cache_clear()
+
+
+@contextlib.contextmanager
+def scoped_caches() -> Iterator[None]:
+    """
+    Clears every cache when the outermost scope exits, so entries made while
+    rendering, for example during one `save`, do not outlive it.
+    """
+    global _scope_depth
+    with _scope_lock:
+        _scope_depth += 1
+    try:
+        yield
+    finally:
+        with _scope_lock:
+            _scope_depth -= 1
+            if _scope_depth == 0:
+                clear_caches()
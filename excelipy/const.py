@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 from importlib.resources import files
 from pathlib import Path
 
@@ -76,4 +77,14 @@ PRE_PROCESS_MAP = dict(
     numeric_format=python_to_excel_fmt,
 )
 
-AI_GUIDE = (Path(str(files(resources))) / "AI.md").read_text(encoding="utf-8")
+
+@lru_cache(maxsize=1)
+def _read_ai_guide() -> str:
+    return (Path(str(files(resources))) / "AI.md").read_text(encoding="utf-8")
+
+
+def __getattr__(name: str) -> str:
+    # AI_GUIDE is read from disk on first access rather than at import time
+    if name == "AI_GUIDE":
+        return _read_ai_guide()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
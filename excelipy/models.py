@@ -1,5 +1,6 @@
 import io
-from collections.abc import Callable, Sequence
+import os
+from collections.abc import Callable, Iterator, Sequence
 from pathlib import Path
 from typing import Annotated, Any, Literal
 
@@ -10,12 +11,15 @@ from pydantic import (
     Field,
     GetCoreSchemaHandler,
     GetJsonSchemaHandler,
+    PrivateAttr,
     model_validator,
 )
 from pydantic.json_schema import JsonSchemaValue
 from pydantic_core import core_schema
 from typing_extensions import Self
 
+from excelipy.sources import FileSource, FrameChunks, TableSource, from_arrow
+
 AlignOptions = Literal[
     "left",
     "center",
@@ -35,6 +39,46 @@ VAlignOptions = Literal[
 ]
 
 
+class StyleCore:
+    """
+    Compact value of a `Style`: only its set fields, with a precomputed hash.
+    Merging is a single dict merge, so the last non-None value of each field wins.
+
+    Examples:
+        >>> base = StyleCore(dict(font_size=11, bold=True))
+        >>> merged = base.merge(StyleCore(dict(font_size=14)))
+        >>> merged.fields
+        {'font_size': 14, 'bold': True}
+        >>> merged == StyleCore(dict(bold=True, font_size=14))
+        True
+    """
+
+    __slots__ = ("fields", "_hash")
+
+    def __init__(self, fields: dict[str, Any]):
+        self.fields = fields
+        self._hash = hash(frozenset(fields.items()))
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # String hashes are salted per process, so the hash is recomputed on load
+        return StyleCore, (self.fields,)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, StyleCore):
+            return NotImplemented
+        return self._hash == other._hash and self.fields == other.fields
+
+    def merge(self, other: "StyleCore") -> "StyleCore":
+        if not other.fields:
+            return self
+        if not self.fields:
+            return other
+        return StyleCore({**self.fields, **other.fields})
+
+
 class Style(BaseModel):
     align: AlignOptions | None = Field(default=None)
     background: str | None = Field(default=None)
@@ -62,6 +106,43 @@ class Style(BaseModel):
     valign: VAlignOptions | None = Field(default=None)
 
     model_config = ConfigDict(frozen=True)
+    _core: StyleCore | None = PrivateAttr(default=None)
+
+    @property
+    def core(self) -> StyleCore:
+        """
+        Validated fields of the style as a `StyleCore`, computed once per instance.
+        """
+        core = self._core
+        if core is None:
+            core = StyleCore({k: v for k, v in self.__dict__.items() if v is not None})
+            self._core = core
+        return core
+
+    @classmethod
+    def from_core(cls, core: StyleCore) -> Self:
+        """
+        Builds a style from already validated fields, skipping validation.
+        """
+        style = cls.model_construct(**core.fields)
+        style._core = core
+        return style
+
+    def __hash__(self) -> int:
+        return hash(self.core)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Style):
+            return NotImplemented
+        return self.core == other.core
+
+    def model_copy(
+        self, *, update: dict[str, Any] | None = None, deep: bool = False
+    ) -> Self:
+        copied = super().model_copy(update=update, deep=deep)
+        if update:
+            copied._core = None
+        return copied
 
     def __str__(self) -> str:
         """
@@ -73,10 +154,17 @@ class Style(BaseModel):
         return str(self.model_dump(exclude_defaults=True))
 
     def merge(self, other: Self) -> Self:
-        self_dict = self.model_dump(exclude_none=True)
-        other_dict = other.model_dump(exclude_none=True)
-        self_dict.update(other_dict)
-        return self.model_validate(self_dict)
+        """
+        Examples:
+            >>> Style(font_size=11, bold=True).merge(Style(font_size=14))
+            Style(...bold=True...font_size=14...)
+        """
+        merged = self.core.merge(other.core)
+        if merged is self.core:
+            return self
+        if merged is other.core and type(other) is type(self):
+            return other
+        return self.from_core(merged)
 
     def pl(self) -> int:
         return self.padding_left or self.padding or 0
@@ -147,9 +235,17 @@ class DataFrameAsJsonLines(pd.DataFrame):
     """A pandas DataFrame subclass that Pydantic can serialize/deserialize as JSON Lines."""
 
     @classmethod
-    def _validate(cls, value: Any) -> pd.DataFrame:
-        if isinstance(value, pd.DataFrame):
+    def _validate(cls, value: Any) -> pd.DataFrame | TableSource:
+        if isinstance(value, (pd.DataFrame, TableSource)):
             return value
+        if (arrow_data := from_arrow(value)) is not None:
+            return arrow_data
+        if isinstance(value, os.PathLike):
+            return FileSource(value)
+        if isinstance(value, dict) and "path" in value:
+            return FileSource.from_spec(value)
+        if isinstance(value, Iterator):
+            return FrameChunks(value)
         if isinstance(value, str):
             return pd.read_json(io.StringIO(value), lines=True)
         if isinstance(value, list):
@@ -157,7 +253,9 @@ class DataFrameAsJsonLines(pd.DataFrame):
         raise ValueError(f"Cannot convert {type(value)} to DataFrame")
 
     @classmethod
-    def _serialize(cls, df: pd.DataFrame) -> list:
+    def _serialize(cls, df: pd.DataFrame | TableSource) -> list | dict:
+        if isinstance(df, TableSource):
+            return df.to_spec()
         return df.to_dict(orient="records")
 
     @classmethod
@@ -171,7 +269,12 @@ class DataFrameAsJsonLines(pd.DataFrame):
             serialization=core_schema.plain_serializer_function_ser_schema(
                 cls._serialize,
                 info_arg=False,
-                return_schema=core_schema.list_schema(core_schema.dict_schema()),
+                return_schema=core_schema.union_schema(
+                    [
+                        core_schema.list_schema(core_schema.dict_schema()),
+                        core_schema.dict_schema(),
+                    ]
+                ),
             ),
         )
 
@@ -182,9 +285,19 @@ class DataFrameAsJsonLines(pd.DataFrame):
         handler: GetJsonSchemaHandler,
     ) -> JsonSchemaValue:
         return {
-            "type": "array",
-            "items": {"type": "object"},
-            "description": "DataFrame as array of records",
+            "anyOf": [
+                {
+                    "type": "array",
+                    "items": {"type": "object"},
+                    "description": "DataFrame as array of records",
+                },
+                {
+                    "type": "object",
+                    "properties": {"path": {"type": "string"}},
+                    "required": ["path"],
+                    "description": "Parquet or Feather file read lazily",
+                },
+            ]
         }
 
 
@@ -193,8 +306,11 @@ StyleFunc = Callable[[Any], Style]
 
 class Table(BaseComponent):
     type: Literal["table"] = Field(default="table")
-    data: Annotated[pd.DataFrame, DataFrameAsJsonLines]
+    # A DataFrame, or a TableSource (an iterator of DataFrames, a Parquet/Feather
+    # path or spec dict, Arrow data) written by chunks
+    data: Annotated[pd.DataFrame | TableSource, DataFrameAsJsonLines]
     auto_size: bool = Field(default=True)
+    auto_size_sample_threshold: int | None = Field(default=None)
     auto_width_padding: int | None = Field(default=None)
     auto_width_tuning: int | None = Field(default=None)
     body_style: Style = Field(default_factory=Style)
@@ -217,6 +333,13 @@ class Table(BaseComponent):
         color: str = "#D0D0D0",
         pattern: Literal["even", "odd"] = "odd",
     ) -> Self:
+        num_rows = (
+            self.data.shape[0]
+            if isinstance(self.data, pd.DataFrame)
+            else self.data.num_rows
+        )
+        if num_rows is None:
+            raise ValueError("with_stripes needs the row count of the table data")
         return self.model_copy(
             update=dict(
                 row_style={
@@ -226,7 +349,7 @@ class Table(BaseComponent):
                         or (pattern == "even" and idx % 2 == 0)
                         else self.row_style.get(idx, Style())
                     )
-                    for idx in range(self.data.shape[0])
+                    for idx in range(num_rows)
                 }
             )
         )
@@ -256,4 +379,9 @@ class Excel(BaseModel):
     path: Path | io.BytesIO
     sheets: list[Sheet] = Field(default_factory=list)
     nan_inf_to_errors: bool = Field(default=True)
+    constant_memory: bool = Field(default=False)
+    # Distinct cell formats after which a warning is logged (Excel allows
+    # 64,000), and whether further formats fall back to their number format
+    format_budget: int | None = Field(default=None)
+    format_budget_fallback: bool = Field(default=False)
     model_config = ConfigDict(arbitrary_types_allowed=True)
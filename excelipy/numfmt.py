@@ -0,0 +1,445 @@
+"""
+Display width of numbers and dates under an Excel number format. Widths come
+from digit counts, separators and decimals worked out arithmetically over whole
+columns, times the glyph widths of the font, so auto-size does not render a
+string per cell. Formats this module cannot lay out (scientific, fractions,
+sections, colors, ...) are reported as None, for callers to measure text.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from excelipy.const import python_to_excel_fmt
+from excelipy.sizing import (
+    DEFAULT_FONT_FAMILY,
+    DEFAULT_FONT_SIZE,
+    get_text_sizer,
+    to_excel_sizes,
+)
+
+# Characters Excel shows at most for a number in the General format
+GENERAL_MAX_CHARS = 11
+# Decimals of General numbers are searched up to this precision
+GENERAL_MAX_DECIMALS = 10
+# Shown instead of NaN and infinite values (see xlsxwriter's nan_inf_to_errors)
+NAN_TEXT = "#NUM!"
+INF_TEXT = "#DIV/0!"
+
+MONTHS = (
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+)
+WEEKDAYS = (
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+)
+
+# Serial number of 1970-01-01 in Excel's 1900 date system
+_UNIX_EPOCH_SERIAL = 25569
+_NS_PER_DAY = 86_400 * 10**9
+_POWERS_OF_TEN = 10.0 ** np.arange(1, 309)
+# Parts of a format that lay out neither numbers nor plain dates
+_UNSUPPORTED = re.compile(r"[;\[*@?/Ee]")
+_DATE_CHARS = re.compile(r"[ymdhs]", re.IGNORECASE)
+_QUOTED = re.compile(r'"[^"]*"|\\.')
+
+
+@dataclass(frozen=True)
+class NumberLayout:
+    """
+    How a number format lays out a value: the General format, or a fixed
+    number of decimals with optional thousands separators and percent sign.
+    """
+
+    general: bool = False
+    decimals: int = 0
+    # Integer digits always shown, padded with zeros ("00.0" shows 2)
+    min_int_digits: int = 1
+    thousands: bool = False
+    percent: bool = False
+    # Text around the number, such as currency symbols and units
+    literal: str = ""
+
+
+@dataclass(frozen=True)
+class DateLayout:
+    """
+    Tokens of a date format: "yyyy", "mm", "mmmm", "d", "AM/PM", ... for
+    date parts ("n" and "nn" for minutes), anything else for literal text.
+    """
+
+    tokens: tuple[str, ...]
+    twelve_hour: bool = False
+
+
+# Date tokens by their letter run, "m" standing for months
+_DATE_TOKENS = {
+    "y": {1: "yy", 2: "yy", 3: "yyyy", 4: "yyyy"},
+    "m": {1: "m", 2: "mm", 3: "mmm", 4: "mmmm", 5: "mmmmm"},
+    "d": {1: "d", 2: "dd", 3: "ddd", 4: "dddd"},
+    "h": {1: "h", 2: "hh"},
+    "s": {1: "s", 2: "ss"},
+}
+_ALL_TOKENS = {token for by_run in _DATE_TOKENS.values() for token in by_run.values()}
+
+
+def _literals(fmt: str) -> list[tuple[bool, str]]:
+    """
+    Splits a format into (is_literal, text) parts, unquoting quoted text and
+    backslash escapes.
+    """
+    parts = []
+    pos = 0
+    for match in _QUOTED.finditer(fmt):
+        parts.append((False, fmt[pos : match.start()]))
+        text = match.group()
+        parts.append((True, text[1:-1] if text.startswith('"') else text[1]))
+        pos = match.end()
+    parts.append((False, fmt[pos:]))
+    return [(literal, text) for literal, text in parts if text]
+
+
+def _parse_number(parts: list[tuple[bool, str]]) -> NumberLayout:
+    decimals = 0
+    min_int_digits = 0
+    thousands = False
+    percent = False
+    literal = ""
+    in_decimals = False
+    for is_literal, text in parts:
+        if is_literal:
+            literal += text
+            continue
+        for char in text:
+            if char in "0#":
+                if in_decimals:
+                    decimals += 1
+                elif char == "0":
+                    min_int_digits += 1
+            elif char == "." and not in_decimals:
+                in_decimals = True
+            elif char == "," and not in_decimals:
+                thousands = True
+            elif char == "%":
+                percent = True
+                literal += char
+            elif char == "_":
+                # Padding as wide as the next character, which stays in `text`
+                continue
+            else:
+                literal += char
+    return NumberLayout(
+        decimals=decimals,
+        min_int_digits=min_int_digits,
+        thousands=thousands,
+        percent=percent,
+        literal=literal,
+    )
+
+
+def _parse_date(parts: list[tuple[bool, str]]) -> DateLayout:
+    tokens: list[str] = []
+    twelve_hour = False
+    for is_literal, text in parts:
+        if is_literal:
+            tokens.append(text)
+            continue
+        pos = 0
+        while pos < len(text):
+            rest = text[pos:]
+            if rest[:5].upper() == "AM/PM" or rest[:3].upper() == "A/P":
+                marker = "AM/PM" if rest[:5].upper() == "AM/PM" else "A/P"
+                tokens.append(marker)
+                twelve_hour = True
+                pos += len(marker)
+                continue
+            letter = rest[0].lower()
+            if letter not in _DATE_TOKENS:
+                tokens.append(rest[0])
+                pos += 1
+                continue
+            run = len(rest) - len(rest.lstrip(rest[0]))
+            by_run = _DATE_TOKENS[letter]
+            tokens.append(by_run[min(run, max(by_run))])
+            pos += run
+    # "m" right after hours or right before seconds means minutes
+    date_parts = [idx for idx, token in enumerate(tokens) if token in _ALL_TOKENS]
+    for prev, idx, nxt in zip([None, *date_parts], date_parts, [*date_parts[1:], None]):
+        if tokens[idx] in ("m", "mm") and (
+            (prev is not None and tokens[prev] in ("h", "hh"))
+            or (nxt is not None and tokens[nxt] in ("s", "ss"))
+        ):
+            tokens[idx] = tokens[idx].replace("m", "n")
+    return DateLayout(tokens=tuple(tokens), twelve_hour=twelve_hour)
+
+
+@lru_cache(maxsize=256)
+def parse_number_format(fmt: str | None) -> NumberLayout | DateLayout | None:
+    """
+    Layout of a `Style.numeric_format`, Python or Excel style, or None when
+    it is not one this module can lay out.
+
+    Examples:
+        >>> parse_number_format(",.2f")
+        NumberLayout(general=False, decimals=2, min_int_digits=1, thousands=True, percent=False, literal='')
+        >>> parse_number_format('"$"#,##0.00_)').literal
+        '$)'
+        >>> parse_number_format("%Y-%m-%d %H:%M").tokens
+        ('yyyy', '-', 'mm', '-', 'dd', ' ', 'hh', ':', 'nn')
+        >>> parse_number_format("0.00E+00") is None
+        True
+    """
+    fmt = python_to_excel_fmt(fmt)
+    if fmt == "General":
+        return NumberLayout(general=True)
+    parts = _literals(fmt)
+    unquoted = "".join(text for is_literal, text in parts if not is_literal)
+    if _DATE_CHARS.search(unquoted):
+        # Date formats may hold "/" and "AM/PM", but still no sections or colors
+        if re.search(r"[;\[*@?]", unquoted):
+            return None
+        return _parse_date(parts)
+    if _UNSUPPORTED.search(unquoted) or re.search(r",(?![0#])", unquoted):
+        # A trailing comma scales the number by a thousand
+        return None
+    return _parse_number(parts)
+
+
+class _Glyphs:
+    """
+    Pixel widths of the characters numbers and dates are made of, for one font.
+    Digits take the width of the widest one, which is every digit in most fonts.
+    """
+
+    def __init__(self, font_size: int | None, font_family: str | None):
+        self.font_size = font_size or DEFAULT_FONT_SIZE
+        self.font_family = font_family or DEFAULT_FONT_FAMILY
+        self._widths: dict[str, float] = {}
+        self.digit = max(self.widths("0123456789"))
+
+    def widths(self, texts: list[str] | tuple[str, ...] | str) -> list[float]:
+        missing = [text for text in dict.fromkeys(texts) if text not in self._widths]
+        if missing:
+            measured = get_text_sizer().measure_many(
+                missing, self.font_size, self.font_family
+            )
+            self._widths.update(zip(missing, measured.tolist()))
+        return [self._widths[text] for text in texts]
+
+    def width(self, text: str) -> float:
+        return self.widths([text])[0]
+
+
+def _digit_counts(int_part: np.ndarray) -> np.ndarray:
+    """
+    Digits of non-negative whole numbers, 0 having none.
+
+    >>> _digit_counts(np.array([0.0, 1.0, 9.0, 10.0, 999.0, 1000.0])).tolist()
+    [0, 1, 1, 2, 3, 4]
+    """
+    counts = np.searchsorted(_POWERS_OF_TEN, int_part, side="right") + 1
+    return np.where(int_part >= 1, counts, 0)
+
+
+def _general_decimals(magnitude: np.ndarray, available: np.ndarray) -> np.ndarray:
+    """
+    Decimals General shows: the fewest that hold the value, up to `available`.
+    """
+    decimals = np.full(magnitude.shape, GENERAL_MAX_DECIMALS)
+    pending = np.ones(magnitude.shape, dtype=bool)
+    for count in range(GENERAL_MAX_DECIMALS + 1):
+        scaled = magnitude * 10.0**count
+        exact = np.abs(scaled - np.round(scaled)) <= np.maximum(scaled, 1) * 1e-12
+        decimals[pending & exact] = count
+        pending &= ~exact
+        if not pending.any():
+            break
+    return np.clip(np.minimum(decimals, available), 0, None)
+
+
+def _number_pixels(
+    values: np.ndarray,
+    layout: NumberLayout,
+    glyphs: _Glyphs,
+) -> np.ndarray:
+    finite = np.isfinite(values)
+    magnitude = np.abs(np.where(finite, values, 0.0))
+    negative = finite & (values < 0)
+    if layout.percent:
+        magnitude = magnitude * 100
+    if layout.general:
+        int_digits = np.maximum(_digit_counts(np.floor(magnitude)), 1)
+        available = GENERAL_MAX_CHARS - negative - int_digits - 1
+        decimals = _general_decimals(magnitude - np.floor(magnitude), available)
+        # Rounding to those decimals can carry into the integer part
+        magnitude = np.round(magnitude * 10.0**decimals) / 10.0**decimals
+        int_digits = np.maximum(_digit_counts(np.floor(magnitude)), 1)
+        scientific = negative + int_digits > GENERAL_MAX_CHARS
+    else:
+        # Excel rounds halves away from zero
+        scale = 10.0**layout.decimals
+        magnitude = np.floor(magnitude * scale + 0.5) / scale
+        int_digits = np.maximum(
+            _digit_counts(np.floor(magnitude)), layout.min_int_digits
+        )
+        decimals = np.full(values.shape, layout.decimals)
+        scientific = np.zeros(values.shape, dtype=bool)
+
+    comma, point, minus = glyphs.widths([",", ".", "-"])
+    pixels = (
+        (int_digits + decimals) * glyphs.digit
+        + (decimals > 0) * point
+        + negative * minus
+        + glyphs.width(layout.literal)
+    )
+    if layout.thousands:
+        pixels += (np.maximum(int_digits, 1) - 1) // 3 * comma
+    if scientific.any():
+        # Such as 1.23457E+11
+        pixels[scientific] = (
+            8 * glyphs.digit + point + glyphs.width("E+") + negative[scientific] * minus
+        )
+    if not finite.all():
+        nan_width, inf_width = glyphs.widths([NAN_TEXT, INF_TEXT])
+        pixels[~finite] = np.where(np.isnan(values[~finite]), nan_width, inf_width)
+    return pixels
+
+
+def _name_pixels(names: tuple[str, ...], idxs: np.ndarray, glyphs: _Glyphs):
+    return np.asarray(glyphs.widths(names))[idxs]
+
+
+def _date_pixels(
+    values: np.ndarray,
+    layout: DateLayout,
+    glyphs: _Glyphs,
+) -> np.ndarray:
+    nanos = np.where(np.isnat(values), 0, values.astype(np.int64))
+    days = nanos // _NS_PER_DAY
+    dates = days.astype("datetime64[D]")
+    months = dates.astype("datetime64[M]")
+    month = months.astype(np.int64) % 12
+    seconds_of_day = nanos % _NS_PER_DAY // 10**9
+    hour = seconds_of_day // 3600
+    if layout.twelve_hour:
+        hour = (hour + 11) % 12 + 1
+    parts = {
+        "m": month + 1,
+        "d": (dates - months).astype(np.int64) + 1,
+        "h": hour,
+        "n": seconds_of_day // 60 % 60,
+        "s": seconds_of_day % 60,
+    }
+    # 1970-01-01 was a Thursday
+    weekday = (days + 3) % 7
+    am = seconds_of_day < 12 * 3600
+
+    pixels = np.zeros(values.shape)
+    for token in layout.tokens:
+        if token in ("yy", "yyyy"):
+            pixels += len(token) * glyphs.digit
+        elif token in ("mm", "dd", "hh", "nn", "ss"):
+            pixels += 2 * glyphs.digit
+        elif token in parts:
+            pixels += (1 + (parts[token] >= 10)) * glyphs.digit
+        elif token in ("mmm", "mmmm", "mmmmm"):
+            length = {"mmm": 3, "mmmm": None, "mmmmm": 1}[token]
+            names = tuple(name[:length] for name in MONTHS)
+            pixels += _name_pixels(names, month, glyphs)
+        elif token in ("ddd", "dddd"):
+            names = tuple(name[: 3 if token == "ddd" else None] for name in WEEKDAYS)
+            pixels += _name_pixels(names, weekday, glyphs)
+        elif token in ("AM/PM", "A/P"):
+            am_width, pm_width = glyphs.widths(token.split("/"))
+            pixels += np.where(am, am_width, pm_width)
+        else:
+            pixels += glyphs.width(token)
+    return pixels
+
+
+def number_sizes(
+    values: np.ndarray,
+    numeric_format: str | None,
+    font_size: int | None = None,
+    font_family: str | None = None,
+) -> np.ndarray | None:
+    """
+    Vectorized `get_text_size` of numbers as Excel shows them under
+    `numeric_format`, or None when the format cannot be laid out.
+
+    Examples:
+        >>> from excelipy.sizing import get_text_size
+        >>> values = np.array([1234.5, -0.25, 3.0])
+        >>> number_sizes(values, ",.2f").tolist() == [
+        ...     get_text_size(text) for text in ("1,234.50", "-0.25", "3.00")
+        ... ]
+        True
+        >>> number_sizes(values, None).tolist() == [
+        ...     get_text_size(text) for text in ("1234.5", "-0.25", "3")
+        ... ]
+        True
+    """
+    layout = parse_number_format(numeric_format)
+    if not isinstance(layout, NumberLayout):
+        return None
+    glyphs = _Glyphs(font_size, font_family)
+    values = np.asarray(values, dtype=np.float64)
+    return to_excel_sizes(_number_pixels(values, layout, glyphs))
+
+
+def datetime_sizes(
+    values: np.ndarray,
+    numeric_format: str | None,
+    font_size: int | None = None,
+    font_family: str | None = None,
+) -> np.ndarray | None:
+    """
+    Vectorized `get_text_size` of datetimes as Excel shows them under
+    `numeric_format`: a date layout, or the serial number for number formats.
+    Missing values are written as blanks. None when the format cannot be
+    laid out.
+
+    Examples:
+        >>> from excelipy.sizing import get_text_size
+        >>> values = np.array(["2024-09-05T13:07", "NaT"], dtype="datetime64[ns]")
+        >>> datetime_sizes(values, "%d %B %Y %H:%M").tolist() == [
+        ...     get_text_size("05 September 2024 13:07"), get_text_size("")
+        ... ]
+        True
+        >>> datetime_sizes(values, "0.00").tolist() == [
+        ...     get_text_size("45540.55"), get_text_size("")
+        ... ]
+        True
+    """
+    layout = parse_number_format(numeric_format)
+    if layout is None:
+        return None
+    glyphs = _Glyphs(font_size, font_family)
+    values = np.asarray(values, dtype="datetime64[ns]")
+    missing = np.isnat(values)
+    if isinstance(layout, DateLayout):
+        pixels = _date_pixels(values, layout, glyphs)
+    else:
+        nanos = np.where(missing, 0, values.astype(np.int64))
+        serials = _UNIX_EPOCH_SERIAL + nanos / _NS_PER_DAY
+        pixels = _number_pixels(serials, layout, glyphs)
+    pixels[missing] = 0
+    return to_excel_sizes(pixels)
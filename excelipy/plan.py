@@ -0,0 +1,281 @@
+"""
+Render plans: the xlsxwriter calls needed to write one sheet, recorded against a
+stand-in workbook. Cell writes are kept as columnar arrays next to a format
+table, so a plan can be built without a workbook (in worker processes, ahead
+of time), inspected, serialized and later replayed, in order, into a real
+worksheet.
+"""
+
+import datetime as dt
+from array import array
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any
+
+from xlsxwriter.workbook import Workbook, Worksheet
+
+from excelipy.stats import SheetStats
+from excelipy.style import get_style_registry
+
+# Worksheet methods writing a single (row, col, value, format) cell, recorded
+# into the columnar cell arrays of the plan
+CELL_METHODS = (
+    "write",
+    "write_number",
+    "write_string",
+    "write_boolean",
+    "write_datetime",
+    "write_blank",
+)
+
+# Other worksheet methods the writers call, recorded as plan calls
+CALL_METHODS = (
+    "write_url",
+    "merge_range",
+    "set_column",
+    "set_row",
+    "autofilter",
+    "insert_image",
+    "hide_gridlines",
+)
+
+RECORDED_METHODS = CELL_METHODS + CALL_METHODS
+
+# Index into the format table of cells written without a format
+NO_FORMAT = -1
+
+# A worksheet call made after `position` cells were written
+Call = tuple[int, str, tuple[Any, ...], dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class FormatRef:
+    """
+    Placeholder for a format of the plan, resolved when the plan is replayed.
+    """
+
+    index: int
+
+
+@dataclass
+class SheetPlan:
+    """
+    Everything written to one sheet, in call order.
+
+    Cells are stored column-wise: the i-th cell is written with
+    `CELL_METHODS[methods[i]]` at `(rows[i], cols[i])`, holding `values[i]` in
+    format `formats[format_ids[i]]` (`NO_FORMAT` for none). Other calls (merges,
+    column widths, row heights, links, images, ...) are kept in `calls` with
+    the number of cells written before them, so replaying keeps the original
+    order, which `constant_memory` workbooks depend on.
+    """
+
+    formats: list[dict[str, Any]] = field(default_factory=list)
+    methods: array = field(default_factory=lambda: array("b"))
+    rows: array = field(default_factory=lambda: array("l"))
+    cols: array = field(default_factory=lambda: array("l"))
+    values: list[Any] = field(default_factory=list)
+    format_ids: array = field(default_factory=lambda: array("l"))
+    calls: list[Call] = field(default_factory=list)
+    # Timings of the planning, not part of `to_dict`
+    stats: SheetStats | None = None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _calls_of(self, name: str) -> list[tuple[Any, ...]]:
+        return [args for _, call, args, _ in self.calls if call == name]
+
+    @property
+    def merges(self) -> list[tuple[Any, ...]]:
+        """
+        `(first_row, first_col, last_row, last_col, value, format)` of merges.
+        """
+        return self._calls_of("merge_range")
+
+    @property
+    def column_widths(self) -> dict[int, float]:
+        return {args[0]: args[2] for args in self._calls_of("set_column")}
+
+    @property
+    def row_heights(self) -> dict[int, float]:
+        return {args[0]: args[1] for args in self._calls_of("set_row")}
+
+    def cells(self) -> list[tuple[int, int, Any, dict[str, Any] | None]]:
+        """
+        `(row, col, value, format properties)` of every written cell.
+
+        Examples:
+            >>> plan = SheetPlan()
+            >>> cell_format = PlanningWorkbook(plan).add_format({"bold": True})
+            >>> PlanningWorksheet(plan).write_number(0, 1, 2.5, cell_format)
+            0
+            >>> plan.cells()
+            [(0, 1, 2.5, {'bold': True})]
+        """
+        return [
+            (row, col, value, None if idx == NO_FORMAT else self.formats[idx])
+            for row, col, value, idx in zip(
+                self.rows, self.cols, self.values, self.format_ids
+            )
+        ]
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        JSON-compatible form of the plan, read back by `SheetPlan.from_dict`.
+        """
+        return {
+            "formats": self.formats,
+            "methods": [CELL_METHODS[idx] for idx in self.methods],
+            "rows": self.rows.tolist(),
+            "cols": self.cols.tolist(),
+            "values": [_dump_value(value) for value in self.values],
+            "format_ids": self.format_ids.tolist(),
+            "calls": [
+                [
+                    position,
+                    name,
+                    [_dump_value(arg) for arg in args],
+                    {key: _dump_value(value) for key, value in kwargs.items()},
+                ]
+                for position, name, args, kwargs in self.calls
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "SheetPlan":
+        return cls(
+            formats=data["formats"],
+            methods=array("b", [CELL_METHODS.index(name) for name in data["methods"]]),
+            rows=array("l", data["rows"]),
+            cols=array("l", data["cols"]),
+            values=[_load_value(value) for value in data["values"]],
+            format_ids=array("l", data["format_ids"]),
+            calls=[
+                (
+                    position,
+                    name,
+                    tuple(_load_value(arg) for arg in args),
+                    {key: _load_value(value) for key, value in kwargs.items()},
+                )
+                for position, name, args, kwargs in data["calls"]
+            ],
+        )
+
+
+# Tags of the values JSON cannot hold as they are
+_DATETIME_TAGS = {"datetime": dt.datetime, "date": dt.date, "time": dt.time}
+
+
+def _dump_value(value: Any) -> Any:
+    if type(value) is FormatRef:
+        return {"format": value.index}
+    for tag, kind in _DATETIME_TAGS.items():
+        if isinstance(value, kind):
+            return {tag: value.isoformat()}
+    return value
+
+
+def _load_value(value: Any) -> Any:
+    if not isinstance(value, dict) or len(value) != 1:
+        return value
+    ((tag, payload),) = value.items()
+    if tag == "format":
+        return FormatRef(payload)
+    if tag in _DATETIME_TAGS:
+        return _DATETIME_TAGS[tag].fromisoformat(payload)
+    return value
+
+
+class PlanningWorkbook:
+    """
+    Stands in for an xlsxwriter Workbook while planning, handing out a
+    `FormatRef` for every format the writers create.
+    """
+
+    def __init__(self, plan: SheetPlan):
+        self.plan = plan
+
+    def add_format(self, properties: dict[str, Any] | None = None) -> FormatRef:
+        self.plan.formats.append(dict(properties or {}))
+        return FormatRef(len(self.plan.formats) - 1)
+
+
+class PlanningWorksheet:
+    """
+    Stands in for an xlsxwriter Worksheet while planning, recording every call
+    of `RECORDED_METHODS` into the plan.
+
+    Examples:
+        >>> plan = SheetPlan()
+        >>> worksheet = PlanningWorksheet(plan)
+        >>> worksheet.set_column(1, 1, 12.5)
+        0
+        >>> plan.calls, plan.column_widths
+        ([(0, 'set_column', (1, 1, 12.5), {})], {1: 12.5})
+    """
+
+    def __init__(self, plan: SheetPlan, constant_memory: bool = False):
+        self.plan = plan
+        self.constant_memory = constant_memory
+        for idx, name in enumerate(CELL_METHODS):
+            setattr(self, name, partial(self._record_cell, idx, name))
+        for name in CALL_METHODS:
+            setattr(self, name, partial(self._record, name))
+
+    def _record_cell(
+        self,
+        method: int,
+        name: str,
+        row: int,
+        col: int,
+        value: Any = None,
+        cell_format: FormatRef | None = None,
+        *args: Any,
+        **kwargs: Any,
+    ) -> int:
+        if args or kwargs:
+            return self._record(name, row, col, value, cell_format, *args, **kwargs)
+        plan = self.plan
+        plan.methods.append(method)
+        plan.rows.append(row)
+        plan.cols.append(col)
+        plan.values.append(value)
+        plan.format_ids.append(NO_FORMAT if cell_format is None else cell_format.index)
+        return 0
+
+    def _record(self, name: str, *args: Any, **kwargs: Any) -> int:
+        self.plan.calls.append((len(self.plan.values), name, args, kwargs))
+        return 0
+
+
+def replay_plan(plan: SheetPlan, workbook: Workbook, worksheet: Worksheet) -> None:
+    """
+    Performs the operations of a plan on a real worksheet.
+    """
+    registry = get_style_registry(workbook)
+    formats = [registry.format_for_properties(props) for props in plan.formats]
+    # NO_FORMAT (-1) indexes this trailing None
+    formats.append(None)
+    cell_methods = [getattr(worksheet, name) for name in CELL_METHODS]
+
+    def resolve(value: Any) -> Any:
+        return formats[value.index] if type(value) is FormatRef else value
+
+    def call(name: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> None:
+        getattr(worksheet, name)(
+            *[resolve(arg) for arg in args],
+            **{key: resolve(value) for key, value in kwargs.items()},
+        )
+
+    calls = iter(plan.calls)
+    pending = next(calls, None)
+    cells = zip(plan.methods, plan.rows, plan.cols, plan.values, plan.format_ids)
+    for position, (method, row, col, value, format_id) in enumerate(cells):
+        while pending is not None and pending[0] == position:
+            call(*pending[1:])
+            pending = next(calls, None)
+        cell_methods[method](row, col, value, formats[format_id])
+    while pending is not None:
+        call(*pending[1:])
+        pending = next(calls, None)
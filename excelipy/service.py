@@ -1,8 +1,23 @@
+import asyncio
+import contextlib
+import io
 import logging
+import os
+import pickle
+import threading
+import time
+import weakref
 from collections.abc import Callable, Sequence
+from concurrent.futures import CancelledError, Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import cast
 
 import xlsxwriter
+from xlsxwriter.workbook import Workbook, Worksheet
 
+from excelipy.cache import DETERMINISTIC_CREATED, OutputCache, excel_digest
 from excelipy.models import (
     Component,
     Excel,
@@ -10,9 +25,26 @@ from excelipy.models import (
     Group,
     Image,
     Link,
+    Sheet,
     Table,
     Text,
 )
+from excelipy.plan import (
+    PlanningWorkbook,
+    PlanningWorksheet,
+    SheetPlan,
+    replay_plan,
+)
+from excelipy.sizing import (
+    DEFAULT_FONT_FAMILY,
+    DEFAULT_FONT_SIZE,
+    get_font_cache_dir,
+    glyph_widths,
+    set_font_cache_dir,
+)
+from excelipy.sources import TableSource
+from excelipy.stats import ComponentStats, RenderStats, SheetStats, component_stats
+from excelipy.style import STYLE_REGISTRY_ATTR, StyleRegistry
 from excelipy.writers import (
     write_fill,
     write_image,
@@ -23,6 +55,9 @@ from excelipy.writers import (
 
 log = logging.getLogger("excelipy")
 
+# Renders of `save_async` running at once per event loop, unless a semaphore is given
+ASYNC_RENDER_LIMIT = 2
+
 WRITING_MAP: dict[type[Component], Callable[..., tuple[int, int]]] = {
     Table: write_table,
     Text: write_text,
@@ -56,31 +91,342 @@ def unnest_components(components: Sequence[Component]) -> list[Component]:
     return unnested_comps
 
 
-def save(excel: Excel):
+def _check_cancelled(cancel_event: threading.Event | None) -> None:
+    if cancel_event is not None and cancel_event.is_set():
+        raise CancelledError("Render cancelled")
+
+
+def write_sheet(
+    workbook: Workbook,
+    worksheet: Worksheet,
+    sheet: Sheet,
+    cancel_event: threading.Event | None = None,
+) -> SheetStats:
+    start = time.perf_counter()
+    stats = SheetStats(sheet.name)
+    origin = (sheet.style.pl(), sheet.style.pt())
+
+    if not sheet.grid_lines:
+        worksheet.hide_gridlines(2)
+
+    for component in unnest_components(sheet.components):
+        _check_cancelled(cancel_event)
+        cur_origin = (
+            origin[0] + component.style.pl(),
+            origin[1] + component.style.pt(),
+        )
+        with component_stats(ComponentStats(component.type, component.name)) as cs:
+            x, y = WRITING_MAP[type(component)](
+                workbook,
+                worksheet,
+                component,
+                sheet.style,
+                cur_origin,
+            )
+        cs.cells = x * y
+        stats.components.append(cs)
+        origin = (
+            origin[0] + component.style.pr(),
+            origin[1] + y + component.style.pb(),
+        )
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def plan_sheet(sheet: Sheet, constant_memory: bool = False) -> SheetPlan:
+    """
+    Runs the writers of a sheet against a stand-in workbook, returning the
+    recorded plan instead of writing anything.
+    """
+    plan = SheetPlan()
+    plan.stats = write_sheet(
+        cast(Workbook, PlanningWorkbook(plan)),
+        cast(Worksheet, PlanningWorksheet(plan, constant_memory)),
+        sheet,
+    )
+    return plan
+
+
+def can_plan_in_worker(sheet: Sheet) -> bool:
+    """
+    Sheets are pickled to reach worker processes, so their StyleFuncs must be
+    importable module-level functions, and streamed table data must be
+    picklable. Other sheets are planned by the calling process instead.
+    """
+    for component in unnest_components(sheet.components):
+        if not isinstance(component, Table):
+            continue
+        payload = [
+            style
+            for style in (
+                *component.column_style.values(),
+                *component.idx_column_style.values(),
+            )
+            if callable(style)
+        ]
+        if isinstance(component.data, TableSource):
+            payload.append(component.data)
+        for obj in payload:
+            try:
+                pickle.dumps(obj)
+            except Exception:
+                log.debug(f"Sheet {sheet.name} has unpicklable {obj}")
+                return False
+    return True
+
+
+def _write_workbook(
+    excel: Excel,
+    path: Path | io.BytesIO,
+    workers: int | None = None,
+    cancel_event: threading.Event | None = None,
+    properties: dict | None = None,
+) -> RenderStats:
+    start = time.perf_counter()
+    stats = RenderStats()
     workbook_args = {
         "nan_inf_to_errors": excel.nan_inf_to_errors,
+        "constant_memory": excel.constant_memory,
     }
-    with xlsxwriter.Workbook(excel.path, workbook_args) as workbook:
-        for sheet in excel.sheets:
-            origin = (sheet.style.pl(), sheet.style.pt())
-            worksheet = workbook.add_worksheet(sheet.name)
-
-            if not sheet.grid_lines:
-                worksheet.hide_gridlines(2)
-
-            for component in unnest_components(sheet.components):
-                cur_origin = (
-                    origin[0] + component.style.pl(),
-                    origin[1] + component.style.pt(),
-                )
-                _, y = WRITING_MAP[type(component)](
-                    workbook,
-                    worksheet,
-                    component,
-                    sheet.style,
-                    cur_origin,
-                )
-                origin = (
-                    origin[0] + component.style.pr(),
-                    origin[1] + y + component.style.pb(),
+    plans: list[Future[SheetPlan] | None] = [None] * len(excel.sheets)
+    executor = None
+    if workers is not None and workers > 1:
+        remote = [idx for idx, s in enumerate(excel.sheets) if can_plan_in_worker(s)]
+        if remote:
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(remote)))
+            for idx in remote:
+                plans[idx] = executor.submit(
+                    plan_sheet, excel.sheets[idx], excel.constant_memory
                 )
+    try:
+        with xlsxwriter.Workbook(path, workbook_args) as workbook:
+            if properties:
+                workbook.set_properties(properties)
+            registry = StyleRegistry(
+                workbook, excel.format_budget, excel.format_budget_fallback
+            )
+            setattr(workbook, STYLE_REGISTRY_ATTR, registry)
+            for sheet, plan in zip(excel.sheets, plans):
+                worksheet = workbook.add_worksheet(sheet.name)
+                if plan is None:
+                    sheet_stats = write_sheet(workbook, worksheet, sheet, cancel_event)
+                else:
+                    _check_cancelled(cancel_event)
+                    sheet_plan = plan.result()
+                    sheet_stats = sheet_plan.stats or SheetStats(sheet.name)
+                    replay_start = time.perf_counter()
+                    replay_plan(sheet_plan, workbook, worksheet)
+                    sheet_stats.phases["replay"] = time.perf_counter() - replay_start
+                stats.sheets.append(sheet_stats)
+            log.debug(f"Created {registry.formats_created} formats")
+            stats.formats_created = registry.formats_created
+            stats.formats_fallback = registry.formats_fallback
+            close_start = time.perf_counter()
+        stats.phases["close"] = time.perf_counter() - close_start
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    stats.bytes_written = _output_size(path)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def _output_size(path: Path | io.BytesIO) -> int:
+    if isinstance(path, io.BytesIO):
+        with path.getbuffer() as view:
+            return view.nbytes
+    return os.path.getsize(path)
+
+
+def _save_cached(
+    excel: Excel,
+    cache: OutputCache,
+    workers: int | None = None,
+    cancel_event: threading.Event | None = None,
+) -> RenderStats | None:
+    """
+    Writes the excel from the cache, rendering and storing it on a miss.
+    Returns None, writing nothing, when the excel cannot be hashed.
+    """
+    start = time.perf_counter()
+    key = excel_digest(excel)
+    if key is None:
+        return None
+    data = cache.get(key)
+    if data is None:
+        log.debug(f"Output cache miss {key}")
+        buffer = io.BytesIO()
+        properties = {"created": DETERMINISTIC_CREATED}
+        stats = _write_workbook(excel, buffer, workers, cancel_event, properties)
+        data = buffer.getvalue()
+        cache.put(key, data)
+    else:
+        stats = RenderStats(bytes_written=len(data), cached=True)
+    if isinstance(excel.path, io.BytesIO):
+        excel.path.write(data)
+    else:
+        Path(excel.path).write_bytes(data)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def save(
+    excel: Excel,
+    workers: int | None = None,
+    cancel_event: threading.Event | None = None,
+    cache: OutputCache | None = None,
+) -> RenderStats:
+    """
+    Writes the excel to `excel.path`.
+
+    Args:
+        excel: Excel to be written
+        workers: Number of processes planning sheets in parallel. Plans are still
+            written to the workbook one sheet at a time, in order, by this process.
+        cancel_event: When set from another thread, the render stops before the
+            next component with a `concurrent.futures.CancelledError`.
+        cache: Output cache returning the bytes of a previous render of the same
+            content. Cached workbooks get a fixed creation date, so identical
+            models render to identical files. Excels that cannot be hashed (see
+            `excel_digest`) are rendered as usual.
+
+    Returns:
+        Timings per sheet, component and phase, cell counts and bytes written.
+        Sheets planned in workers report their planning phases plus "replay".
+    """
+    if cache is not None:
+        stats = _save_cached(excel, cache, workers, cancel_event)
+        if stats is not None:
+            return stats
+    return _write_workbook(excel, excel.path, workers, cancel_event)
+
+
+@dataclass(frozen=True)
+class SaveResult:
+    """
+    Outcome of one workbook of `save_many`.
+    """
+
+    path: Path | io.BytesIO
+    elapsed: float
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _warm_worker(font_cache_dir: Path | None) -> None:
+    """
+    Initializer of `save_many` workers: loads the glyph widths of the default
+    font once per process instead of once per workbook.
+    """
+    if font_cache_dir is not None:
+        set_font_cache_dir(font_cache_dir)
+    glyph_widths(DEFAULT_FONT_SIZE, DEFAULT_FONT_FAMILY)
+
+
+def _timed_save(
+    excel: Excel,
+    in_worker: bool = False,
+) -> tuple[float, bytes | None, Exception | None]:
+    """
+    Saves one workbook of `save_many`, returning the elapsed time and the error
+    instead of raising. In workers, in-memory outputs are returned as bytes,
+    since the caller's buffer does not travel across processes.
+    """
+    buffered = in_worker and isinstance(excel.path, io.BytesIO)
+    if buffered:
+        excel = excel.model_copy(update={"path": io.BytesIO()})
+    start = time.perf_counter()
+    try:
+        save(excel)
+    except Exception as e:
+        log.debug(f"Could not save {excel.path}.\nException: {e}")
+        return time.perf_counter() - start, None, e
+    elapsed = time.perf_counter() - start
+    return elapsed, cast(io.BytesIO, excel.path).getvalue() if buffered else None, None
+
+
+def save_many(excels: Sequence[Excel], workers: int | None = None) -> list[SaveResult]:
+    """
+    Saves many workbooks across a pool of `workers` processes. A workbook that
+    fails is reported in its result instead of stopping the batch.
+
+    Workbooks whose StyleFuncs cannot be pickled are saved by the calling
+    process while the pool works on the others.
+
+    Returns:
+        One result per excel, in the same order.
+    """
+    results: list[SaveResult | None] = [None] * len(excels)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_warm_worker,
+        initargs=(get_font_cache_dir(),),
+    ) as executor:
+        futures = {
+            idx: executor.submit(_timed_save, excel, True)
+            for idx, excel in enumerate(excels)
+            if all(can_plan_in_worker(sheet) for sheet in excel.sheets)
+        }
+        for idx, excel in enumerate(excels):
+            if idx not in futures:
+                elapsed, _, error = _timed_save(excel)
+                results[idx] = SaveResult(excel.path, elapsed, error)
+        for idx, future in futures.items():
+            excel = excels[idx]
+            try:
+                elapsed, data, error = future.result()
+            except Exception as e:
+                elapsed, data, error = 0.0, None, e
+            if data is not None:
+                cast(io.BytesIO, excel.path).write(data)
+            results[idx] = SaveResult(excel.path, elapsed, error)
+    return cast(list[SaveResult], results)
+
+
+_async_semaphores: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, asyncio.Semaphore
+] = weakref.WeakKeyDictionary()
+
+
+def _default_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(ASYNC_RENDER_LIMIT)
+        _async_semaphores[loop] = semaphore
+    return semaphore
+
+
+async def save_async(
+    excel: Excel,
+    executor: Executor | None = None,
+    semaphore: asyncio.Semaphore | None = None,
+) -> RenderStats:
+    """
+    Writes the excel without blocking the event loop, rendering it in a thread
+    of `executor` (the loop's default executor when None).
+
+    At most `ASYNC_RENDER_LIMIT` renders run at once per event loop, unless a
+    shared `semaphore` is given. Renders of different workbooks share no
+    mutable state besides the caches of `excelipy.caches`, which are thread-safe.
+
+    Cancelling the awaiting task stops the render before its next component and
+    waits for it to wind down before re-raising, so the semaphore slot is only
+    released once the thread is done. The output may hold a partial workbook.
+    """
+    loop = asyncio.get_running_loop()
+    cancel_event = threading.Event()
+    async with semaphore or _default_semaphore():
+        render = loop.run_in_executor(
+            executor, partial(save, excel, cancel_event=cancel_event)
+        )
+        try:
+            return await asyncio.shield(render)
+        except asyncio.CancelledError:
+            cancel_event.set()
+            with contextlib.suppress(Exception):
+                await render
+            raise
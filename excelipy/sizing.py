@@ -0,0 +1,339 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from excelipy.caches import bounded_cache
+
+if TYPE_CHECKING:
+    from PIL import ImageFont
+
+log = logging.getLogger("excelipy")
+
+DEFAULT_FONT_SIZE = 11
+DEFAULT_FONT_FAMILY = "Calibri"
+
+TUNING_DEFAULT = 5
+PADDING_DEFAULT = 2
+
+# Code points covered by the glyph lookup table (ASCII + Latin-1)
+LOOKUP_TABLE_SIZE = 256
+# Max amount of characters handled at once when measuring a batch of texts
+LOOKUP_CHUNK_CHARS = 4_000_000
+# Directory of the persistent glyph width cache, disabled when unset
+FONT_CACHE_ENV = "EXCELIPY_FONT_CACHE_DIR"
+
+_font_cache_dir: Path | None = (
+    Path(os.environ[FONT_CACHE_ENV]) if os.environ.get(FONT_CACHE_ENV) else None
+)
+# PIL fonts are shared through `_load_font`, but FreeType faces must not be used
+# by two threads at once. The caches themselves are thread-safe.
+_font_lock = threading.Lock()
+
+
+@bounded_cache("load_font", maxsize=64)
+def _load_font(
+    font_family: str,
+    font_size: int,
+) -> "ImageFont.ImageFont | ImageFont.FreeTypeFont":
+    # PIL is only imported once a font is needed
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype(f"{font_family.lower()}.ttf", font_size)
+    except Exception as e:
+        log.debug(
+            f"Could not load custom font {font_family}, using default.\nException: {e}"
+        )
+        return ImageFont.load_default()
+
+
+@bounded_cache("char_size", maxsize=8192)
+def get_char_size(
+    char: str,
+    font_size: int,
+    font_family: str,
+) -> int | float:
+    with _font_lock:
+        return _load_font(font_family, font_size).getlength(char)
+
+
+class TextSizer(ABC):
+    """
+    Measures text widths in pixels. Subclass and register with `set_text_sizer`
+    to plug a different sizing engine into auto-size.
+
+    Examples:
+        >>> class MonospaceSizer(TextSizer):
+        ...     def measure(self, text, font_size, font_family):
+        ...         return len(text) * font_size * 0.6
+        >>> MonospaceSizer().measure_many(["ab", "abcd"], 10, "Mono").tolist()
+        [12.0, 24.0]
+    """
+
+    @abstractmethod
+    def measure(self, text: str, font_size: int, font_family: str) -> float:
+        """
+        Width of `text` in pixels.
+        """
+
+    def measure_many(
+        self,
+        texts: Sequence[str],
+        font_size: int,
+        font_family: str,
+    ) -> np.ndarray:
+        return np.fromiter(
+            (self.measure(text, font_size, font_family) for text in texts),
+            dtype=np.float64,
+            count=len(texts),
+        )
+
+
+class PilTextSizer(TextSizer):
+    """
+    Measures every character through PIL, one (cached) call per character.
+    """
+
+    def measure(self, text: str, font_size: int, font_family: str) -> float:
+        total_size = 0
+        for char in text:
+            total_size += get_char_size(char, font_size, font_family)
+        return total_size
+
+
+def _compute_glyph_widths(font_size: int, font_family: str) -> np.ndarray:
+    table = np.fromiter(
+        (
+            get_char_size(chr(code), font_size, font_family)
+            for code in range(LOOKUP_TABLE_SIZE)
+        ),
+        dtype=np.float32,
+        count=LOOKUP_TABLE_SIZE,
+    )
+    table[0] = 0
+    return table
+
+
+@bounded_cache("font_file_digest", maxsize=128)
+def _file_digest(path: str, mtime_ns: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def font_cache_key(font_size: int, font_family: str) -> str:
+    """
+    Identifies the glyph widths of a font by the hash of its font file and the
+    size it was loaded with, so fonts resolving to the same file share entries.
+    """
+    font = _load_font(font_family, font_size)
+    source = getattr(font, "path", None)
+    if isinstance(source, io.BytesIO):
+        digest = hashlib.sha256(source.getvalue()).hexdigest()
+    elif isinstance(source, (str, bytes, os.PathLike)):
+        path = os.fsdecode(source)
+        digest = _file_digest(path, os.stat(path).st_mtime_ns)
+    else:
+        import PIL
+
+        digest = hashlib.sha256(f"bitmap-{PIL.__version__}".encode()).hexdigest()
+    return f"{digest[:32]}-{getattr(font, 'size', font_size)}-{LOOKUP_TABLE_SIZE}"
+
+
+def _load_cached_glyph_widths(
+    cache_dir: Path,
+    font_size: int,
+    font_family: str,
+) -> np.ndarray:
+    path = cache_dir / f"{font_cache_key(font_size, font_family)}.npy"
+    if not path.exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        table = _compute_glyph_widths(font_size, font_family)
+        # Write to a temporary file first so concurrent processes never read
+        # a partially written table.
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+
+def set_font_cache_dir(cache_dir: str | Path | None) -> None:
+    """
+    Enables the persistent glyph width cache at `cache_dir` (or disables it
+    when None). Tables are stored as `.npy` files keyed by font file hash and
+    size, and memory-mapped when loaded, so processes share them for free.
+    Defaults to the `EXCELIPY_FONT_CACHE_DIR` environment variable.
+    """
+    global _font_cache_dir
+    _font_cache_dir = Path(cache_dir) if cache_dir is not None else None
+    glyph_widths.cache_clear()
+
+
+def get_font_cache_dir() -> Path | None:
+    return _font_cache_dir
+
+
+def warm_font_cache(fonts: Iterable[tuple[str, int]]) -> list[Path]:
+    """
+    Precomputes the glyph widths of the given (font_family, font_size) pairs
+    into the persistent cache, returning the cache files.
+
+    Examples:
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as cache_dir:
+        ...     set_font_cache_dir(cache_dir)
+        ...     paths = warm_font_cache([("Calibri", 11), ("Calibri", 11)])
+        ...     cached = glyph_widths(11, "Calibri")
+        ...     set_font_cache_dir(None)
+        >>> len(set(paths))
+        1
+        >>> bool((cached == glyph_widths(11, "Calibri")).all())
+        True
+    """
+    if _font_cache_dir is None:
+        raise ValueError(
+            "Font cache directory is not set, call set_font_cache_dir "
+            f"or set {FONT_CACHE_ENV}"
+        )
+    paths = []
+    for font_family, font_size in fonts:
+        glyph_widths(font_size, font_family)
+        paths.append(_font_cache_dir / f"{font_cache_key(font_size, font_family)}.npy")
+    return paths
+
+
+@bounded_cache("glyph_widths", maxsize=128)
+def glyph_widths(font_size: int, font_family: str) -> np.ndarray:
+    """
+    Width of every code point below `LOOKUP_TABLE_SIZE` for the given font.
+    The NUL entry is zero, so it can double as padding.
+
+    Examples:
+        >>> table = glyph_widths(11, "Calibri")
+        >>> table.shape
+        (256,)
+        >>> float(table[0])
+        0.0
+        >>> float(table[ord("a")]) == get_char_size("a", 11, "Calibri")
+        True
+    """
+    if _font_cache_dir is not None:
+        try:
+            return _load_cached_glyph_widths(_font_cache_dir, font_size, font_family)
+        except OSError as e:
+            log.debug(f"Could not use font cache at {_font_cache_dir}.\nException: {e}")
+    table = _compute_glyph_widths(font_size, font_family)
+    table.setflags(write=False)
+    return table
+
+
+class LookupTextSizer(TextSizer):
+    """
+    Sums widths from a per-font glyph table, measuring whole batches of texts
+    with a single NumPy gather. PIL is only used for characters outside the table.
+
+    Examples:
+        >>> sizer = LookupTextSizer()
+        >>> texts = ["avocado", "toast", "", "café ☕"]
+        >>> expected = [PilTextSizer().measure(t, 11, "Calibri") for t in texts]
+        >>> sizer.measure_many(texts, 11, "Calibri").tolist() == expected
+        True
+    """
+
+    def measure(self, text: str, font_size: int, font_family: str) -> float:
+        return float(self.measure_many([text], font_size, font_family)[0])
+
+    def measure_many(
+        self,
+        texts: Sequence[str],
+        font_size: int,
+        font_family: str,
+    ) -> np.ndarray:
+        result = np.zeros(len(texts), dtype=np.float64)
+        if not len(texts):
+            return result
+        table = glyph_widths(font_size, font_family)
+        max_len = max(1, max(map(len, texts)))
+        chunk_rows = max(1, LOOKUP_CHUNK_CHARS // max_len)
+        for beg in range(0, len(texts), chunk_rows):
+            chunk = np.asarray(texts[beg : beg + chunk_rows], dtype=np.str_)
+            codes = chunk.view(np.uint32).reshape(len(chunk), -1)
+            outside = codes >= LOOKUP_TABLE_SIZE
+            widths = table[np.where(outside, 0, codes)]
+            result[beg : beg + len(chunk)] = widths.sum(axis=1, dtype=np.float64)
+            for row_idx in np.flatnonzero(outside.any(axis=1)):
+                for code in codes[row_idx][outside[row_idx]]:
+                    result[beg + row_idx] += get_char_size(
+                        chr(code), font_size, font_family
+                    )
+        return result
+
+
+_text_sizer: TextSizer = LookupTextSizer()
+
+
+def set_text_sizer(sizer: TextSizer) -> None:
+    """
+    Replaces the engine used to measure text during auto-size.
+    """
+    global _text_sizer
+    _text_sizer = sizer
+
+
+def get_text_sizer() -> TextSizer:
+    return _text_sizer
+
+
+def _px_to_excel(px: float) -> int:
+    return int(px // TUNING_DEFAULT + PADDING_DEFAULT)
+
+
+def get_text_size(
+    text: str,
+    font_size: int | None = None,
+    font_family: str | None = None,
+) -> int:
+    cur_font_size = font_size or DEFAULT_FONT_SIZE
+    cur_font_family = font_family or DEFAULT_FONT_FAMILY
+    return _px_to_excel(_text_sizer.measure(str(text), cur_font_size, cur_font_family))
+
+
+def get_text_sizes(
+    texts: Sequence[str],
+    font_size: int | None = None,
+    font_family: str | None = None,
+) -> np.ndarray:
+    """
+    Vectorized `get_text_size` for texts sharing one font.
+
+    Examples:
+        >>> get_text_sizes(["a", "avocado toast"]).tolist() == [
+        ...     get_text_size("a"),
+        ...     get_text_size("avocado toast"),
+        ... ]
+        True
+    """
+    cur_font_size = font_size or DEFAULT_FONT_SIZE
+    cur_font_family = font_family or DEFAULT_FONT_FAMILY
+    return to_excel_sizes(
+        _text_sizer.measure_many(texts, cur_font_size, cur_font_family)
+    )
+
+
+def to_excel_sizes(px: np.ndarray) -> np.ndarray:
+    """
+    Vectorized column widths of texts `px` pixels wide, as `get_text_size`.
+    """
+    return (px // TUNING_DEFAULT + PADDING_DEFAULT).astype(np.int64)
@@ -0,0 +1,223 @@
+"""
+Table bodies that are read chunk by chunk instead of held in one DataFrame.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from functools import cached_property
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+
+class TableSource(ABC):
+    """
+    Data of a `Table` produced as a sequence of DataFrame chunks sharing the same
+    columns. Chunks are written one after the other below a single header, so
+    memory is bounded by the chunk size (with `Excel(constant_memory=True)`).
+    """
+
+    # Row count when known ahead of time, needed by `Table.with_stripes`
+    num_rows: int | None = None
+
+    @abstractmethod
+    def chunks(self) -> Iterator[pd.DataFrame]:
+        """
+        DataFrames of the table, in row order.
+        """
+
+    def to_spec(self) -> dict[str, Any]:
+        """
+        Serializable description of the source, for `Table.model_dump`.
+        """
+        raise ValueError(f"{type(self).__name__} cannot be serialized")
+
+
+class FrameChunks(TableSource):
+    """
+    Wraps an iterable of DataFrames, for example `pd.read_csv(..., chunksize=n)`
+    or a generator over a database cursor. Iterators can only be written once.
+
+    Examples:
+        >>> source = FrameChunks(pd.DataFrame({"a": [i, i + 1]}) for i in (0, 2))
+        >>> [chunk["a"].tolist() for chunk in source.chunks()]
+        [[0, 1], [2, 3]]
+    """
+
+    def __init__(self, frames: Iterable[pd.DataFrame]):
+        self.frames = frames
+
+    def chunks(self) -> Iterator[pd.DataFrame]:
+        return iter(self.frames)
+
+
+def _arrow_frame(data: Any) -> pd.DataFrame:
+    # ArrowDtype columns wrap the Arrow buffers as they are, without a copy
+    return data.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def from_arrow(data: Any) -> pd.DataFrame | TableSource | None:
+    """
+    Reads `pyarrow.Table` / `RecordBatch` and Polars DataFrames into a DataFrame
+    backed by their Arrow buffers (`pd.ArrowDtype` columns), so no data is
+    copied. A `RecordBatchReader` or a DuckDB relation becomes a source written
+    one batch at a time. Returns None for anything else, without importing
+    pyarrow.
+
+    Examples:
+        >>> import pyarrow as pa
+        >>> df = from_arrow(pa.table({"a": [1, None]}))
+        >>> df["a"].dtype, df["a"].isna().tolist()
+        (int64[pyarrow], [False, True])
+        >>> from_arrow([1, 2]) is None
+        True
+    """
+    module = type(data).__module__.partition(".")[0]
+    if module in ("duckdb", "_duckdb"):
+        return RelationSource(data)
+    if module == "polars" and hasattr(data, "to_arrow"):
+        data = data.to_arrow()
+        module = "pyarrow"
+    if module != "pyarrow":
+        return None
+    import pyarrow as pa
+
+    if isinstance(data, pa.RecordBatchReader):
+        return FrameChunks(_arrow_frame(batch) for batch in data)
+    if isinstance(data, (pa.Table, pa.RecordBatch)):
+        return _arrow_frame(data)
+    return None
+
+
+# File formats by suffix, as named by `pyarrow.dataset`
+FILE_FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".ipc": "feather",
+}
+
+
+class FileSource(TableSource):
+    """
+    Parquet or Feather file read lazily: the file is memory-mapped, only
+    `columns` are read, and record batches are streamed from `offset` up to
+    `limit` rows. Parquet row groups before `offset` are skipped unread.
+    Holds only the path and options, so it is cheap to pickle and serializes
+    to its spec.
+
+    Examples:
+        >>> source = FileSource("sales.parquet", columns=["Product"], limit=100)
+        >>> source.to_spec()["columns"]
+        ['Product']
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        columns: list[str] | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+        batch_size: int = 65_536,
+        format: str | None = None,
+    ):
+        self.path = os.fspath(path)
+        self.columns = columns
+        self.offset = offset
+        self.limit = limit
+        self.batch_size = batch_size
+        self.format = format or FILE_FORMATS.get(Path(self.path).suffix.lower())
+        if self.format is None:
+            raise ValueError(f"Cannot infer the file format of {self.path}")
+
+    @classmethod
+    def from_spec(cls, spec: dict[str, Any]) -> "FileSource":
+        return cls(**spec)
+
+    def to_spec(self) -> dict[str, Any]:
+        return dict(
+            path=self.path,
+            columns=self.columns,
+            offset=self.offset,
+            limit=self.limit,
+            batch_size=self.batch_size,
+            format=self.format,
+        )
+
+    def _dataset(self) -> Any:
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+
+        return ds.dataset(
+            self.path,
+            format=self.format,
+            filesystem=fs.LocalFileSystem(use_mmap=True),
+        )
+
+    @cached_property
+    def num_rows(self) -> int:
+        # Parquet row counts come from the footer, without reading data
+        total = max(self._dataset().count_rows() - self.offset, 0)
+        return total if self.limit is None else min(total, self.limit)
+
+    def _skip_row_groups(self, dataset: Any) -> tuple[Any, int]:
+        """
+        The dataset without the Parquet row groups that lie entirely before
+        `offset`, found from the footer metadata without reading them, and the
+        rows left to skip in the first row group kept.
+        """
+        import pyarrow.dataset as ds
+
+        skip = self.offset
+        if self.format != "parquet" or not skip:
+            return dataset, skip
+        kept = []
+        for fragment in dataset.get_fragments():
+            for row_group in fragment.split_by_row_group():
+                num_rows = row_group.row_groups[0].num_rows
+                if not kept and skip >= num_rows:
+                    skip -= num_rows
+                else:
+                    kept.append(row_group)
+        skipped = ds.FileSystemDataset(
+            kept, dataset.schema, dataset.format, dataset.filesystem
+        )
+        return skipped, skip
+
+    def chunks(self) -> Iterator[pd.DataFrame]:
+        dataset, skip = self._skip_row_groups(self._dataset())
+        batches = dataset.to_batches(columns=self.columns, batch_size=self.batch_size)
+        remaining = self.limit
+        for batch in batches:
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            batch = batch.slice(skip, remaining)
+            skip = 0
+            if remaining is not None:
+                remaining -= batch.num_rows
+            if batch.num_rows:
+                yield _arrow_frame(batch)
+            if remaining == 0:
+                return
+
+
+class RelationSource(TableSource):
+    """
+    DuckDB relation, executed when the table is written and streamed as Arrow
+    record batches of `batch_size` rows.
+    """
+
+    def __init__(self, relation: Any, batch_size: int = 65_536):
+        self.relation = relation
+        self.batch_size = batch_size
+
+    def chunks(self) -> Iterator[pd.DataFrame]:
+        if hasattr(self.relation, "to_arrow_reader"):
+            reader = self.relation.to_arrow_reader(self.batch_size)
+        else:
+            reader = self.relation.fetch_record_batch(self.batch_size)
+        return (_arrow_frame(batch) for batch in reader)
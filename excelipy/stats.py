@@ -0,0 +1,129 @@
+"""
+Render statistics returned by `save`: wall time per sheet, per component and per
+phase (header, styles, auto-size, row heights, images, xlsxwriter's close), cell
+counts and bytes written. Timings are taken at phase boundaries only, so
+collecting them costs a few clock reads per component.
+"""
+
+import contextlib
+import time
+from collections.abc import Iterator
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+# Phases timed inside the writers; the remaining time of a component is "write"
+PHASES = ("header", "styles", "auto_size", "row_heights", "image", "write")
+
+
+@dataclass
+class ComponentStats:
+    type: str
+    name: str
+    # Cells covered by the component (columns x rows, header included)
+    cells: int = 0
+    elapsed: float = 0.0
+    phases: dict[str, float] = field(default_factory=dict)
+
+    def add(self, phase_name: str, seconds: float) -> None:
+        self.phases[phase_name] = self.phases.get(phase_name, 0.0) + seconds
+
+
+@dataclass
+class SheetStats:
+    name: str
+    elapsed: float = 0.0
+    components: list[ComponentStats] = field(default_factory=list)
+    # Sheet level phases: "plan" and "replay" for sheets planned in workers
+    phases: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def cells(self) -> int:
+        return sum(component.cells for component in self.components)
+
+
+@dataclass
+class RenderStats:
+    """
+    Statistics of one `save`.
+
+    Examples:
+        >>> stats = RenderStats(sheets=[SheetStats("S", components=[
+        ...     ComponentStats("table", "t", cells=4, phases={"header": 0.5, "write": 1.0}),
+        ...     ComponentStats("text", "x", cells=1, phases={"write": 0.25}),
+        ... ])], phases={"close": 2.0})
+        >>> stats.cells, stats.phase_totals()
+        (5, {'header': 0.5, 'write': 1.25, 'close': 2.0})
+    """
+
+    sheets: list[SheetStats] = field(default_factory=list)
+    elapsed: float = 0.0
+    bytes_written: int = 0
+    formats_created: int = 0
+    # Plain formats added past `format_budget` with `format_budget_fallback`
+    formats_fallback: int = 0
+    # True when the output came from an `OutputCache` without rendering
+    cached: bool = False
+    # Workbook level phases, such as xlsxwriter's "close" (XML and zip)
+    phases: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def cells(self) -> int:
+        return sum(sheet.cells for sheet in self.sheets)
+
+    def phase_totals(self) -> dict[str, float]:
+        """
+        Seconds spent in each phase across components, sheets and the workbook.
+        """
+        totals: dict[str, float] = {}
+        for sheet in self.sheets:
+            for phases in (
+                *(component.phases for component in sheet.components),
+                sheet.phases,
+            ):
+                for name, seconds in phases.items():
+                    totals[name] = totals.get(name, 0.0) + seconds
+        for name, seconds in self.phases.items():
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "cells": self.cells}
+
+
+_current_component: ContextVar[ComponentStats | None] = ContextVar(
+    "excelipy_component_stats", default=None
+)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Adds the time spent in the block to `name` on the component being written.
+    Does nothing outside of `component_stats`.
+    """
+    stats = _current_component.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(name, time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def component_stats(stats: ComponentStats) -> Iterator[ComponentStats]:
+    """
+    Collects the phases of the writers called in the block into `stats`, then
+    fills in its elapsed time and the remaining "write" phase.
+    """
+    token = _current_component.set(stats)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.elapsed = time.perf_counter() - start
+        _current_component.reset(token)
+        stats.add("write", max(stats.elapsed - sum(stats.phases.values()), 0.0))
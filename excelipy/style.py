@@ -1,24 +1,49 @@
+import logging
 from collections.abc import Collection
-from functools import lru_cache
+from typing import Any
 
 from xlsxwriter.workbook import Format, Workbook
 
+from excelipy.caches import bounded_cache
 from excelipy.const import PRE_PROCESS_MAP, PROP_MAP
-from excelipy.models import Style
+from excelipy.models import Style, StyleCore
 
+log = logging.getLogger("excelipy")
 
-def convert_style_to_format(workbook: Workbook, style: Style) -> Format:
-    style_dict = style.model_dump(exclude_none=True)
+STYLE_REGISTRY_ATTR = "_excelipy_style_registry"
+
+# Format property kept by formats falling back under a format budget, so values
+# such as dates and percentages still display as such
+FALLBACK_FORMAT_PROPS = ("num_format",)
+
+
+def style_to_properties(style: Style) -> dict[str, Any]:
+    """
+    xlsxwriter format properties of a style: the `PROP_MAP` fields, normalized
+    by `PRE_PROCESS_MAP`. Fields that are not part of the cell format (padding,
+    fill_*) are left out.
+
+    >>> style_to_properties(Style(bold=True, numeric_format=".2f", fill_na="-"))
+    {'bold': True, 'num_format': '0.00'}
+    """
     style_map = {}
-    for prop, value in style_dict.items():
+    for prop, value in style.core.fields.items():
         if (mapped_prop := PROP_MAP.get(prop)) is not None:
             if prop in PRE_PROCESS_MAP:
                 value = PRE_PROCESS_MAP[prop](value)
             style_map[mapped_prop] = value
-    return workbook.add_format(style_map)
+    return style_map
 
 
-@lru_cache
+def convert_style_to_format(workbook: Workbook, style: Style) -> Format:
+    """
+    New workbook format with the `style_to_properties` of a style. Formats
+    added this way are not shared nor counted by a `StyleRegistry`.
+    """
+    return workbook.add_format(style_to_properties(style))
+
+
+@bounded_cache("merge_styles", maxsize=1024)
 def merge_styles(*styles: Style | None) -> Style:
     """
     Merge multiple styles into one prioritizing the last style provided.
@@ -40,19 +65,159 @@ def merge_styles(*styles: Style | None) -> Style:
     return cur_style
 
 
+class StyleRegistry:
+    """
+    Interns every distinct style of a workbook to an integer id, so the hot
+    paths only juggle ints: merges are memoized per (base_id, overlay_id) pair
+    and formats are created once per id.
+
+    Examples:
+        >>> import io, xlsxwriter
+        >>> registry = StyleRegistry(xlsxwriter.Workbook(io.BytesIO()))
+        >>> base = registry.intern(Style(font_size=12, numeric_format=".2f"))
+        >>> bold = registry.intern(Style(bold=True))
+        >>> merged = registry.merge(base, bold)
+        >>> merged == registry.merge(base, bold), registry.intern(None)
+        (True, 0)
+        >>> registry.styles[merged]
+        Style(...bold=True...font_size=12...numeric_format='.2f'...)
+        >>> registry.styles[registry.without_numeric_format(merged)].numeric_format is None
+        True
+        >>> padded = registry.intern(Style(font_size=12, numeric_format="0.00", padding=2))
+        >>> registry.format(padded) is registry.format(base), registry.formats_created
+        (True, 1)
+    """
+
+    def __init__(
+        self,
+        workbook: Workbook,
+        format_budget: int | None = None,
+        budget_fallback: bool = False,
+    ):
+        self.workbook = workbook
+        self.styles: list[Style] = [Style()]
+        self._ids: dict[Style, int] = {Style(): 0}
+        self._formats: list[Format | None] = [None]
+        self._merges: dict[tuple[int, int], int] = {}
+        self._stripped: dict[int, int] = {}
+        self._formats_by_props: dict[tuple[tuple[str, Any], ...], Format] = {}
+        self.format_budget = format_budget
+        self.budget_fallback = budget_fallback
+        # Formats added to the workbook within the budget, plain formats added
+        # past it with `budget_fallback`, and formats requested over the budget
+        self.formats_created = 0
+        self.formats_fallback = 0
+        self.formats_over_budget = 0
+
+    def intern(self, style: Style | None) -> int:
+        if style is None:
+            return 0
+        style_id = self._ids.get(style)
+        if style_id is None:
+            style_id = len(self.styles)
+            self._ids[style] = style_id
+            self.styles.append(style)
+            self._formats.append(None)
+        return style_id
+
+    def merge(self, base_id: int, overlay_id: int) -> int:
+        """
+        Id of the style resulting from merging the overlay on top of the base.
+        """
+        key = (base_id, overlay_id)
+        merged_id = self._merges.get(key)
+        if merged_id is None:
+            merged = self.styles[base_id].merge(self.styles[overlay_id])
+            merged_id = self.intern(merged)
+            self._merges[key] = merged_id
+        return merged_id
+
+    def without_numeric_format(self, style_id: int) -> int:
+        """
+        Id of the same style with `numeric_format` removed, used for cells whose
+        value was replaced by a fill_* substitution.
+        """
+        stripped_id = self._stripped.get(style_id)
+        if stripped_id is None:
+            fields = dict(self.styles[style_id].core.fields)
+            fields.pop("numeric_format", None)
+            stripped = Style.from_core(StyleCore(fields))
+            stripped_id = self.intern(stripped)
+            self._stripped[style_id] = stripped_id
+        return stripped_id
+
+    def format(self, style_id: int) -> Format:
+        cell_format = self._formats[style_id]
+        if cell_format is None:
+            properties = style_to_properties(self.styles[style_id])
+            cell_format = self.format_for_properties(properties)
+            self._formats[style_id] = cell_format
+        return cell_format
+
+    def format_for_properties(self, properties: dict[str, Any]) -> Format:
+        """
+        Format shared by every style mapping to the same xlsxwriter properties.
+        Past `format_budget` distinct formats, a warning is logged once and, with
+        `budget_fallback`, new formats only keep their `FALLBACK_FORMAT_PROPS`.
+        """
+        key = tuple(sorted(properties.items()))
+        cell_format = self._formats_by_props.get(key)
+        if cell_format is not None:
+            return cell_format
+        if (
+            self.format_budget is not None
+            and self.formats_created >= self.format_budget
+        ):
+            if not self.formats_over_budget:
+                log.warning(
+                    f"More than {self.format_budget} cell formats requested"
+                    + (
+                        ", falling back to plain formats"
+                        if self.budget_fallback
+                        else ""
+                    )
+                )
+            self.formats_over_budget += 1
+            if self.budget_fallback:
+                fallback = {
+                    prop: value
+                    for prop, value in properties.items()
+                    if prop in FALLBACK_FORMAT_PROPS
+                }
+                fallback_key = tuple(sorted(fallback.items()))
+                cell_format = self._formats_by_props.get(fallback_key)
+                if cell_format is None:
+                    cell_format = self._add_format(fallback_key, fallback, True)
+                self._formats_by_props[key] = cell_format
+                return cell_format
+        return self._add_format(key, properties)
+
+    def _add_format(
+        self,
+        key: tuple[tuple[str, Any], ...],
+        properties: dict[str, Any],
+        fallback: bool = False,
+    ) -> Format:
+        cell_format = self.workbook.add_format(properties)
+        if fallback:
+            self.formats_fallback += 1
+        else:
+            self.formats_created += 1
+        self._formats_by_props[key] = cell_format
+        return cell_format
+
+
+def get_style_registry(workbook: Workbook) -> StyleRegistry:
+    registry = getattr(workbook, STYLE_REGISTRY_ATTR, None)
+    if registry is None:
+        registry = StyleRegistry(workbook)
+        setattr(workbook, STYLE_REGISTRY_ATTR, registry)
+    return registry
+
+
 def process_style(
     workbook: Workbook,
     styles: Collection[Style | None],
 ) -> Format:
-    cur_style = merge_styles(*styles)
-    cached_formats = getattr(workbook, "_excelipy_format_cache", None)
-    if cached_formats is None:
-        cached_formats = {}
-        setattr(workbook, "_excelipy_format_cache", cached_formats)
-
-    if cur_style in cached_formats:
-        return cached_formats[cur_style]
-
-    result = convert_style_to_format(workbook, cur_style)
-    cached_formats[cur_style] = result
-    return result
+    registry = get_style_registry(workbook)
+    return registry.format(registry.intern(merge_styles(*styles)))
@@ -1,9 +1,9 @@
 import logging
 
-from PIL import Image as PILImage
 from xlsxwriter.workbook import Workbook, Worksheet
 
 from excelipy.models import Image, Style
+from excelipy.stats import phase
 from excelipy.style import process_style
 
 log = logging.getLogger("excelipy")
@@ -19,8 +19,10 @@ def write_image(
     default_style: Style,
     origin: tuple[int, int] = (0, 0),
 ) -> tuple[int, int]:
+    from PIL import Image as PILImage
+
     log.debug(f"Writing image at {origin}")
-    with PILImage.open(component.path) as img:
+    with phase("image"), PILImage.open(component.path) as img:
         img_w, img_h = img.size
     log.debug(f"img_w={img_w}, img_h={img_h}")
     expected_width = DEFAULT_COLUMN_WIDTH * component.width
@@ -41,14 +43,15 @@ def write_image(
         process_style(workbook, [default_style, component.style]),
     )
 
-    worksheet.insert_image(
-        origin[1],
-        origin[0],
-        component.path.as_posix(),
-        {
-            "x_scale": scale_width,
-            "y_scale": scale_height,
-            "object_position": 1,  # Move and size with cells
-        },
-    )
+    with phase("image"):
+        worksheet.insert_image(
+            origin[1],
+            origin[0],
+            component.path.as_posix(),
+            {
+                "x_scale": scale_width,
+                "y_scale": scale_height,
+                "object_position": 1,  # Move and size with cells
+            },
+        )
     return component.width, component.height
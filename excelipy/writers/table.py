@@ -1,357 +1,1530 @@
-import logging
-import math
-from collections import defaultdict
-from functools import lru_cache
-from typing import cast
-
-import numpy as np
-import pandas as pd
-from PIL import ImageFont
-from xlsxwriter.workbook import Workbook, Worksheet
-
-from excelipy.models import Link, Style, StyleFunc, Table
-from excelipy.style import merge_styles, process_style
-from excelipy.styles.table import DEFAULT_BODY_STYLE, DEFAULT_HEADER_STYLE
-
-log = logging.getLogger("excelipy")
-
-DEFAULT_FONT_SIZE = 11
-DEFAULT_LINE_SPACING = 1.4
-DEFAULT_ROW_HEIGHT = 15.0
-DEFAULT_FONT_FAMILY = "Calibri"
-
-TUNING_DEFAULT = 5
-PADDING_DEFAULT = 2
-
-ROW_WISE_ARG = "_excelipy_row_wise"
-COL_CACHE_NAME = "_excelipy_col_sizes"
-
-
-def row_wise(func):
-    """
-    Marks a StyleFunc (Callable[[...], ep.Style]) to receive all columns instead of only the current row value
-
-    Callable[[Any (data type)], ep.Style] -> Callable[[pd.Series], ep.Style]
-    """
-    setattr(func, ROW_WISE_ARG, True)
-    return func
-
-
-def _static_col_style(component: Table, col_name: str, col_idx: int) -> Style:
-    idx_style = component.idx_column_style.get(col_idx)
-    col_style = component.column_style.get(col_name)
-    maybe = idx_style or col_style
-    return Style() if callable(maybe) or maybe is None else maybe
-
-
-@lru_cache
-def _load_font(
-    font_family: str,
-    font_size: int,
-) -> ImageFont.ImageFont | ImageFont.FreeTypeFont:
-    try:
-        return ImageFont.truetype(f"{font_family.lower()}.ttf", font_size)
-    except Exception as e:
-        log.debug(
-            f"Could not load custom font {font_family}, using default.\nException: {e}"
-        )
-        return ImageFont.load_default()
-
-
-def _px_to_excel(px: float) -> int:
-    return int(px // TUNING_DEFAULT + PADDING_DEFAULT)
-
-
-@lru_cache
-def get_char_size(
-    char: str,
-    font_size: int,
-    font_family: str,
-) -> int | float:
-    return _load_font(font_family, font_size).getlength(char)
-
-
-def get_text_size(
-    text: str,
-    font_size: int | None = None,
-    font_family: str | None = None,
-) -> int:
-    cur_font_size = font_size or DEFAULT_FONT_SIZE
-    cur_font_family = font_family or DEFAULT_FONT_FAMILY
-    total_size = 0
-    for char in str(text):
-        total_size += get_char_size(char, cur_font_size, cur_font_family)
-    return _px_to_excel(total_size)
-
-
-def get_row_height(lines: int, font_size: int | None) -> float:
-    return max(
-        DEFAULT_ROW_HEIGHT,
-        (font_size or DEFAULT_FONT_SIZE) * DEFAULT_LINE_SPACING * lines,
-    )
-
-
-def _maybe_format(text: float | int | str, num_format: str | None) -> str:
-    """
-    Examples:
-        >>> _maybe_format(1.2321, None)
-        '1.2321'
-        >>> _maybe_format(1.2321, ",.2f")
-        '1.23'
-        >>> _maybe_format(1.2321, ",d")
-        '1'
-        >>> _maybe_format(20000, ",d")
-        '20,000'
-        >>> _maybe_format("text", ".2f")
-        'text'
-    """
-    if num_format is None:
-        return str(text)
-    clz = int
-    if "." in str(text) or "f" in num_format:
-        clz = float
-    if "d" in num_format:
-        clz = int
-    try:
-        return format(clz(text), num_format)
-    except Exception:
-        return str(text)
-
-
-def write_table(
-    workbook: Workbook,
-    worksheet: Worksheet,
-    component: Table,
-    default_style: Style,
-    origin: tuple[int, int] = (0, 0),
-) -> tuple[int, int]:
-    """
-    Examples:
-        >>> n = 30_000
-        >>> data = pd.DataFrame({"A": [1, 2, 3] * n, "B": [4, "ha" * 50, 6] * n, "C": [4, 5, 6] * n})
-        >>> long_text = "This is an avocado toast" * 3
-        >>> data.rename(columns={"A": long_text, "B": long_text}, inplace=True)
-        >>> origin = (0, 0)
-        >>> default_style = Style(align="center", valign="vcenter")
-        >>> row_style = {1: Style(font_size=14)}
-        >>> component = Table(data=data, row_style=row_style, min_col_size=10, max_col_size=20, wrap_header=True)
-        >>> import xlsxwriter
-        >>> workbook = xlsxwriter.Workbook("output.xlsx")
-        >>> worksheet = workbook.add_worksheet()
-        >>> _ = write_table(workbook, worksheet, component, default_style)
-        >>> workbook.close()
-    """
-    x_size = component.data.shape[1]
-    y_size = component.data.shape[0] + 1
-
-    df_columns = list(component.data.columns)
-    df_rows = component.data.values.tolist()
-
-    header_size_cache: dict[int, tuple[int, int | None]] = {}
-    body_size_cache: dict[int, dict[int, tuple[int, int | None]]] = defaultdict(dict)
-    biggest_body: dict[int, int] = defaultdict(lambda: 0)
-
-    base_column_range = [(idx, idx) for idx in range(len(df_columns))]
-    column_ranges = list(base_column_range)
-    # =============================== Write headers ================================
-    prev = None
-    prev_format = None
-    min_idx = 0
-    for col_idx, cur_col in enumerate(df_columns):
-        header_style = merge_styles(
-            DEFAULT_HEADER_STYLE if component.default_style else None,
-            default_style,
-            component.style,
-            component.header_style.get(cur_col),
-            Style(text_wrap=True) if component.wrap_header else None,
-        )
-        header_format = process_style(workbook, [header_style])
-        worksheet.write(origin[1], origin[0] + col_idx, cur_col, header_format)
-        if component.merge_equal_headers:
-            last_idx = len(df_columns) - 1
-            group_ends = prev is not None and (cur_col != prev or col_idx == last_idx)
-            end_idx = (
-                col_idx if (col_idx == last_idx and cur_col == prev) else col_idx - 1
-            )
-            if group_ends:
-                if end_idx > min_idx:
-                    worksheet.merge_range(
-                        first_row=origin[1],
-                        first_col=origin[0] + min_idx,
-                        last_row=origin[1],
-                        last_col=origin[0] + end_idx,
-                        data=prev,
-                        cell_format=prev_format,
-                    )
-                    for _idx in range(min_idx, end_idx + 1):
-                        column_ranges.remove((_idx, _idx))
-                    column_ranges.append((min_idx, end_idx))
-                    column_ranges.sort(key=lambda x: x[0])
-                min_idx = col_idx
-            prev = cur_col
-            prev_format = header_format
-        if component.auto_size:
-            header_size_cache[col_idx] = (
-                get_text_size(
-                    cur_col,
-                    header_style.font_size,
-                    header_style.font_family,
-                ),
-                header_style.font_size,
-            )
-
-    # =============================== Header filters ===============================
-    actually_merged = set(base_column_range) != set(column_ranges)
-    if component.header_filters and not actually_merged:
-        worksheet.autofilter(
-            origin[1],
-            origin[0],
-            origin[1],
-            origin[0] + len(list(component.data.columns)) - 1,
-        )
-
-    # ================================= Write body =================================
-    for col_idx, col in enumerate(df_columns):
-        base_style = merge_styles(
-            DEFAULT_BODY_STYLE if component.default_style else None,
-            default_style,
-            component.style,
-            component.body_style,
-            _static_col_style(component, col, col_idx),
-            Style(text_wrap=True) if component.wrap_header else None,
-        )
-        _maybe = Style | StyleFunc | None
-        maybe_func_col_style: _maybe = component.column_style.get(col)
-        maybe_func_idx_col_style: _maybe = component.idx_column_style.get(col_idx)
-        maybe_func_style = maybe_func_idx_col_style or maybe_func_col_style
-        style_func: StyleFunc | None = None
-        if callable(maybe_func_style):
-            style_func: StyleFunc = cast(StyleFunc, maybe_func_style)
-        for row_idx, row in enumerate(df_rows):
-            cell = row[col_idx]
-            row_style = component.row_style.get(row_idx)
-            merged_style = (
-                base_style.merge(row_style) if row_style is not None else base_style
-            )
-            url = None
-            if isinstance(cell, Link):
-                url = cell.url
-                cell = cell.text
-            if merged_style.fill_na is not None and pd.isna(cell):
-                cell = merged_style.fill_na
-                merged_style = merged_style.model_copy(update=dict(numeric_format=None))
-            if merged_style.fill_zero is not None and cell == 0:
-                cell = merged_style.fill_zero
-                merged_style = merged_style.model_copy(update=dict(numeric_format=None))
-            if merged_style.fill_inf is not None and cell in (np.inf, -np.inf):
-                cell = merged_style.fill_inf
-                merged_style = merged_style.model_copy(update=dict(numeric_format=None))
-            if style_func:
-                dyn_style = (
-                    style_func(row)
-                    if getattr(style_func, ROW_WISE_ARG, False)
-                    else style_func(cell)
-                )
-                merged_style = merged_style.merge(dyn_style)
-            if (row_style := component.row_style.get(row_idx)) is not None:
-                merged_style = merged_style.merge(row_style)
-            current_format = process_style(workbook, [merged_style])
-
-            if component.auto_size:
-                cur_txt_size = get_text_size(
-                    str(cell),
-                    merged_style.font_size,
-                    merged_style.font_family,
-                )
-                body_size_cache[col_idx][row_idx] = (
-                    cur_txt_size,
-                    merged_style.font_size,
-                )
-                biggest_body[col_idx] = max(cur_txt_size, biggest_body[col_idx])
-
-            if url is None:
-                worksheet.write(
-                    origin[1] + row_idx + 1,
-                    origin[0] + col_idx,
-                    cell,
-                    current_format,
-                )
-            else:
-                worksheet.write_url(
-                    origin[1] + row_idx + 1,
-                    origin[0] + col_idx,
-                    url,
-                    current_format,
-                    cell,
-                )
-
-    # =============================== Auto Set Width ===============================
-    if component.auto_size:
-        col_sizes = getattr(worksheet, COL_CACHE_NAME, None) or defaultdict(lambda: 0)
-        # Compare cache to body
-        for col_idx, text_size in biggest_body.items():
-            col_sizes[origin[0] + col_idx] = max(
-                text_size,
-                col_sizes[origin[0] + col_idx],
-            )
-        # Compare cache to header (considering merged spans)
-        for beg, end in column_ranges:
-            text_size = header_size_cache[beg][0]
-            cur_body_sizes = [
-                col_sizes[origin[0] + col_idx] for col_idx in range(beg, end + 1)
-            ]
-            num_cols = end - beg + 1
-            total_size = sum(cur_body_sizes)
-            diff = text_size - total_size
-            if diff > 0:
-                to_increase = diff // num_cols
-                for col_idx in range(beg, end + 1):
-                    col_sizes[origin[0] + col_idx] += to_increase
-        # Hard set sizes
-        for col, width in component.column_width.items():
-            idxs = [i for i, c in enumerate(df_columns) if col == c]
-            for idx in idxs:
-                col_sizes[origin[0] + idx] = width
-        # apply constraints
-        for sheet_idx, text_size in col_sizes.items():
-            if component.min_col_size and text_size < component.min_col_size:
-                text_size = component.min_col_size
-            if component.max_col_size and text_size > component.max_col_size:
-                text_size = component.max_col_size
-            col_sizes[sheet_idx] = text_size
-            worksheet.set_column(sheet_idx, sheet_idx, col_sizes[sheet_idx])
-        setattr(worksheet, COL_CACHE_NAME, col_sizes)
-        if component.wrap_header:
-            # row wrap headers
-            for beg, end in column_ranges:
-                text_size, text_font = header_size_cache[beg]
-                cur_body_sizes = [
-                    col_sizes[origin[0] + col_idx] for col_idx in range(beg, end + 1)
-                ]
-                line_size = sum(cur_body_sizes)
-                diff = text_size - line_size
-                if diff > 0:
-                    lines_needed = math.ceil(round(text_size / line_size, 1))
-                    row_height = get_row_height(lines_needed, text_font)
-                    worksheet.set_row(origin[1], row_height)
-            # row wrap body
-            for row_idx in range(len(df_rows)):
-                biggest_diff = 0
-                row_size = 0
-                row_font = None
-                biggest_col_size = 0
-                for col, rows in body_size_cache.items():
-                    col_size = col_sizes[origin[0] + col]
-                    cur_row, cur_font = rows[row_idx]
-                    diff = cur_row - col_size
-                    if diff > biggest_diff:
-                        biggest_diff = diff
-                        row_size = cur_row
-                        biggest_col_size = col_size
-                        row_font = cur_font
-                if biggest_diff > 0:
-                    lines_needed = math.ceil(round(row_size / biggest_col_size, 1))
-                    row_height = get_row_height(lines_needed, row_font)
-                    worksheet.set_row(origin[1] + row_idx + 1, row_height)
-
-    return x_size, y_size
+import bisect
+import heapq
+import itertools
+import logging
+import math
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from typing import Any, NamedTuple, cast
+
+import numpy as np
+import pandas as pd
+from xlsxwriter.workbook import Format, Workbook, Worksheet
+
+from excelipy.models import Link, Style, StyleFunc, Table
+from excelipy.numfmt import datetime_sizes, number_sizes
+from excelipy.sizing import DEFAULT_FONT_SIZE, get_text_size, get_text_sizes
+from excelipy.sources import TableSource
+from excelipy.stats import phase
+from excelipy.style import (
+    StyleRegistry,
+    get_style_registry,
+    merge_styles,
+    process_style,
+)
+from excelipy.styles.table import DEFAULT_BODY_STYLE, DEFAULT_HEADER_STYLE
+
+log = logging.getLogger("excelipy")
+
+FontKey = tuple[int | None, str | None]
+
+DEFAULT_LINE_SPACING = 1.4
+DEFAULT_ROW_HEIGHT = 15.0
+
+SAMPLE_TOP_K = 32
+SAMPLE_RANDOM = 256
+
+ROW_WISE_ARG = "_excelipy_row_wise"
+VECTORIZED_ARG = "_excelipy_vectorized"
+COL_CACHE_NAME = "_excelipy_col_sizes"
+
+# Rows extracted, styled and written at a time in `constant_memory` worksheets
+CONSTANT_MEMORY_BLOCK_ROWS = 10_000
+
+
+def row_wise(func):
+    """
+    Marks a StyleFunc (Callable[[...], ep.Style]) to receive all columns instead of only the current row value
+
+    Callable[[Any (data type)], ep.Style] -> Callable[[pd.Series], ep.Style]
+    """
+    setattr(func, ROW_WISE_ARG, True)
+    return func
+
+
+def vectorized(func):
+    """
+    Marks a StyleFunc to be called once with the whole column instead of once per cell.
+    It must return one ep.Style (or None) per row, as a sequence, array, Series or
+    Categorical. Combined with `row_wise`, it receives the whole DataFrame instead.
+
+    Callable[[Any (data type)], ep.Style] -> Callable[[pd.Series], Sequence[ep.Style | None]]
+    """
+    setattr(func, VECTORIZED_ARG, True)
+    return func
+
+
+def _vectorized_style_ids(
+    registry: StyleRegistry,
+    component: Table,
+    style_func: StyleFunc,
+    col_idx: int,
+) -> list[int]:
+    """
+    Calls a `vectorized` StyleFunc once and interns its styles, returning one
+    style id per row.
+
+    Examples:
+        >>> import io, xlsxwriter
+        >>> from excelipy.style import StyleRegistry
+        >>> registry = StyleRegistry(xlsxwriter.Workbook(io.BytesIO()))
+        >>> red = Style(font_color="#ff0000")
+        >>> component = Table(data=pd.DataFrame({"a": [-1, 2, -3]}))
+        >>> negatives = vectorized(lambda col: np.where(col < 0, red, None))
+        >>> _vectorized_style_ids(registry, component, negatives, 0)
+        [1, 0, 1]
+        >>> by_category = vectorized(lambda col: pd.Categorical.from_codes([0, -1, 0], [red]))
+        >>> _vectorized_style_ids(registry, component, by_category, 0)
+        [1, 0, 1]
+    """
+    data = component.data
+    result = style_func(
+        data if getattr(style_func, ROW_WISE_ARG, False) else data.iloc[:, col_idx]
+    )
+    if len(result) != data.shape[0]:
+        raise ValueError(
+            f"Vectorized style function {style_func} returned {len(result)} styles "
+            f"for {data.shape[0]} rows"
+        )
+    if isinstance(getattr(result, "dtype", None), pd.CategoricalDtype):
+        categorical = pd.Categorical(result)
+        # Code -1 (missing) picks the trailing "no style" id
+        category_ids = np.array(
+            [registry.intern(style) for style in categorical.categories] + [0]
+        )
+        return category_ids[categorical.codes].tolist()
+    # Styles are usually a handful of shared objects, so intern them by identity
+    known_ids: dict[int, int] = {}
+    style_ids = []
+    for style in result:
+        style_id = known_ids.get(id(style))
+        if style_id is None:
+            style_id = registry.intern(style)
+            known_ids[id(style)] = style_id
+        style_ids.append(style_id)
+    return style_ids
+
+
+def _dynamic_style_ids(
+    registry: StyleRegistry,
+    component: Table,
+    style_func: StyleFunc | None,
+    col_idx: int,
+) -> list[int] | None:
+    if style_func is None or not getattr(style_func, VECTORIZED_ARG, False):
+        return None
+    return _vectorized_style_ids(registry, component, style_func, col_idx)
+
+
+def _static_col_style(component: Table, col_name: str, col_idx: int) -> Style:
+    idx_style = component.idx_column_style.get(col_idx)
+    col_style = component.column_style.get(col_name)
+    maybe = idx_style or col_style
+    return Style() if callable(maybe) or maybe is None else maybe
+
+
+def get_row_height(lines: int, font_size: int | None) -> float:
+    return max(
+        DEFAULT_ROW_HEIGHT,
+        (font_size or DEFAULT_FONT_SIZE) * DEFAULT_LINE_SPACING * lines,
+    )
+
+
+def _maybe_format(text: float | int | str, num_format: str | None) -> str:
+    """
+    Examples:
+        >>> _maybe_format(1.2321, None)
+        '1.2321'
+        >>> _maybe_format(1.2321, ",.2f")
+        '1.23'
+        >>> _maybe_format(1.2321, ",d")
+        '1'
+        >>> _maybe_format(20000, ",d")
+        '20,000'
+        >>> _maybe_format("text", ".2f")
+        'text'
+    """
+    if num_format is None:
+        return str(text)
+    clz = int
+    if "." in str(text) or "f" in num_format:
+        clz = float
+    if "d" in num_format:
+        clz = int
+    try:
+        return format(clz(text), num_format)
+    except Exception:
+        return str(text)
+
+
+def _has_na(column: pd.Series) -> bool:
+    """
+    Whether the column holds `pd.NA` (Arrow and nullable dtypes), which
+    xlsxwriter cannot write, so those cells are written as blanks.
+    """
+    return getattr(column.dtype, "na_value", None) is pd.NA and column.hasnans
+
+
+def _typed_writer(worksheet: Worksheet, column: pd.Series) -> Callable[..., int] | None:
+    """
+    Picks the xlsxwriter method matching a column dtype, skipping the generic
+    `write` dispatch. Returns None when values must go through `write`.
+    """
+    dtype = column.dtype
+    if _has_na(column):
+        return None
+    if pd.api.types.is_bool_dtype(dtype):
+        return worksheet.write_boolean
+    if pd.api.types.is_numeric_dtype(dtype):
+        return worksheet.write_number
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+
+        def write_datetime(row: int, col: int, value, cell_format=None) -> int:
+            if value is pd.NaT:
+                return worksheet.write_blank(row, col, None, cell_format)
+            return worksheet.write_datetime(row, col, value, cell_format)
+
+        return write_datetime
+    return None
+
+
+def _column_values(
+    component: Table,
+    col_idx: int,
+    rows: slice = slice(None),
+) -> list[Any]:
+    """
+    Values of one column (or of its `rows`) as Python objects, keeping the
+    column dtype instead of upcasting the whole frame like `DataFrame.values`.
+    """
+    column = component.data.iloc[rows, col_idx]
+    if _has_na(column):
+        return column.to_numpy(dtype=object, na_value=None).tolist()
+    return column.tolist()
+
+
+def _style_rows(
+    component: Table,
+    rows: slice = slice(None),
+) -> list[list[Any]] | None:
+    """
+    Full rows of the table (or its `rows`), only built when a StyleFunc is
+    `row_wise` but not `vectorized`, since those receive the row of every cell
+    they style.
+    """
+    funcs = [*component.column_style.values(), *component.idx_column_style.values()]
+    if any(
+        callable(func)
+        and getattr(func, ROW_WISE_ARG, False)
+        and not getattr(func, VECTORIZED_ARG, False)
+        for func in funcs
+    ):
+        return component.data.iloc[rows].values.tolist()
+    return None
+
+
+def _write_static_column(
+    workbook: Workbook,
+    worksheet: Worksheet,
+    component: Table,
+    cells: list[Any],
+    col_idx: int,
+    base_style: Style,
+    origin: tuple[int, int],
+) -> None:
+    current_format = process_style(workbook, [base_style])
+    typed_write = _typed_writer(worksheet, component.data.iloc[:, col_idx])
+    col = origin[0] + col_idx
+    first_row = origin[1] + 1
+
+    if typed_write is not None:
+        for row_idx, cell in enumerate(cells):
+            typed_write(first_row + row_idx, col, cell, current_format)
+    else:
+        for row_idx, cell in enumerate(cells):
+            if isinstance(cell, Link):
+                worksheet.write_url(
+                    first_row + row_idx, col, cell.url, current_format, cell.text
+                )
+            else:
+                worksheet.write(first_row + row_idx, col, cell, current_format)
+
+
+def _cell_texts(cells: list[Any]) -> list[str]:
+    return [str(cell.text if isinstance(cell, Link) else cell) for cell in cells]
+
+
+def _measure_texts(
+    texts: list[str],
+    fonts: list[FontKey],
+) -> np.ndarray:
+    """
+    Measures texts in one batch per distinct (font_size, font_family).
+
+    Examples:
+        >>> sizes = _measure_texts(["a", "b", "a"], [(11, None), (14, None), (11, None)])
+        >>> sizes.tolist() == [get_text_size("a", 11), get_text_size("b", 14), get_text_size("a", 11)]
+        True
+    """
+    groups: dict[FontKey, list[int]] = defaultdict(list)
+    for idx, font in enumerate(fonts):
+        groups[font].append(idx)
+    sizes = np.zeros(len(texts), dtype=np.int64)
+    for (font_size, font_family), idxs in groups.items():
+        sizes[idxs] = get_text_sizes([texts[i] for i in idxs], font_size, font_family)
+    return sizes
+
+
+def _use_sampling(component: Table) -> bool:
+    """
+    Row heights of wrapped tables need every cell size, so only the column
+    maximum is estimated, and only past `auto_size_sample_threshold` rows.
+    """
+    threshold = component.auto_size_sample_threshold
+    return (
+        not component.wrap_header
+        and threshold is not None
+        and component.data.shape[0] > threshold
+    )
+
+
+def _measure_column(
+    texts: list[str],
+    fonts: list[FontKey] | FontKey,
+) -> tuple[int, np.ndarray]:
+    """
+    Measures the body texts of one column, where `fonts` is either one font for
+    the whole column or one font per text.
+
+    Returns:
+        The biggest text size, and the size of every text.
+    """
+    if not texts:
+        return 0, np.zeros(0, dtype=np.int64)
+    if isinstance(fonts, list):
+        sizes = _measure_texts(texts, fonts)
+    else:
+        sizes = get_text_sizes(texts, *fonts)
+    return int(sizes.max()), sizes
+
+
+def _typed_sizes(column: pd.Series, style: Style) -> np.ndarray | None:
+    """
+    Sizes of a numeric or datetime column as Excel shows it under the style's
+    `numeric_format`, computed without rendering any text. None for other
+    columns, and for formats `numfmt` cannot lay out.
+    """
+    dtype = column.dtype
+    kind = getattr(dtype, "kind", None)
+    if _has_na(column) or kind not in ("i", "u", "f", "M"):
+        return None
+    if kind == "M":
+        if getattr(dtype, "tz", None) is not None:
+            return None
+        return datetime_sizes(
+            column.to_numpy(dtype="datetime64[ns]"),
+            style.numeric_format,
+            style.font_size,
+            style.font_family,
+        )
+    return number_sizes(
+        column.to_numpy(dtype=np.float64),
+        style.numeric_format,
+        style.font_size,
+        style.font_family,
+    )
+
+
+def _style_groups(
+    registry: StyleRegistry,
+    style_ids: np.ndarray | int,
+    num_cells: int,
+) -> tuple[np.ndarray, list[Style]]:
+    """
+    Groups cells by the (numeric_format, font_size, font_family) of their style,
+    the only style fields their size depends on.
+
+    Returns:
+        The group of every cell, and one style of each group.
+    """
+    if isinstance(style_ids, int):
+        return np.zeros(num_cells, dtype=np.intp), [registry.styles[style_ids]]
+    unique_ids, inverse = np.unique(style_ids, return_inverse=True)
+    groups: dict[tuple[Any, ...], int] = {}
+    group_styles: list[Style] = []
+    codes = np.empty(len(unique_ids), dtype=np.intp)
+    for idx, style_id in enumerate(unique_ids.tolist()):
+        style = registry.styles[style_id]
+        key = (style.numeric_format, style.font_size, style.font_family)
+        if key not in groups:
+            groups[key] = len(group_styles)
+            group_styles.append(style)
+        codes[idx] = groups[key]
+    return codes[inverse], group_styles
+
+
+class _ColumnMeasure:
+    """
+    Auto-size measurement of one body column, fed one block of rows at a time.
+    Numbers and datetimes are sized from the `numeric_format` of the style they
+    resolve to, whichever StyleFunc or row_style picked it, by `_typed_sizes`
+    over each (numeric_format, font) group; other cells, and those a fill_*
+    replaced, are measured as text.
+
+    When sampling, texts are only counted per block, keeping the `SAMPLE_TOP_K`
+    longest (by character count weighted by font size) and the `SAMPLE_RANDOM`
+    rows drawn up front with a fixed seed, so memory stays bounded and output
+    reproducible; those candidates are measured by `finish`.
+
+    Examples:
+        >>> import io, xlsxwriter
+        >>> registry = StyleRegistry(xlsxwriter.Workbook(io.BytesIO()))
+        >>> texts = pd.Series(["a"] * 1000 + ["a much longer text"])
+        >>> measure = _ColumnMeasure(len(texts), sample=True)
+        >>> for beg in range(0, len(texts), 300):
+        ...     block = texts.iloc[beg : beg + 300]
+        ...     measure.add(registry, beg, block, block.tolist(), 0)
+        >>> measure.finish() == get_text_size("a much longer text")
+        True
+    """
+
+    def __init__(self, num_rows: int, sample: bool = False):
+        self.biggest = 0
+        self.sample = sample
+        self._random_rows = (
+            np.random.default_rng(0).choice(
+                num_rows, size=min(SAMPLE_RANDOM, num_rows), replace=False
+            )
+            if sample
+            else np.zeros(0, dtype=np.int64)
+        )
+        # Sampled texts as (weighted length, row, text, font)
+        self._longest: list[tuple[float, int, str, FontKey]] = []
+        self._picked: list[tuple[str, FontKey]] = []
+
+    def add(
+        self,
+        registry: StyleRegistry,
+        first_row: int,
+        values: pd.Series,
+        cells: list[Any],
+        style_ids: np.ndarray | int,
+        replaced: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, list[int | None] | int | None] | None:
+        """
+        Measures the block of rows starting at body row `first_row`: `values` as
+        in the data, `cells` as written and the interned style of each cell (or
+        one for all of them).
+
+        Returns:
+            The size and font size of every cell, unless sampling.
+        """
+        num_cells = len(cells)
+        if not num_cells:
+            return None
+        row_groups, group_styles = _style_groups(registry, style_ids, num_cells)
+        sizes = np.zeros(num_cells, dtype=np.int64)
+        is_text = np.ones(num_cells, dtype=bool)
+        if getattr(values.dtype, "kind", None) in ("i", "u", "f", "M"):
+            for group, style in enumerate(group_styles):
+                rows = (
+                    np.flatnonzero(row_groups == group)
+                    if len(group_styles) > 1
+                    else np.arange(num_cells)
+                )
+                if replaced is not None:
+                    rows = rows[~replaced[rows]]
+                if not len(rows):
+                    continue
+                typed = _typed_sizes(
+                    values if len(rows) == num_cells else values.iloc[rows], style
+                )
+                if typed is not None:
+                    sizes[rows] = typed
+                    is_text[rows] = False
+        text_rows = np.flatnonzero(is_text)
+        texts = _cell_texts([cells[idx] for idx in text_rows.tolist()])
+        font_keys = [(style.font_size, style.font_family) for style in group_styles]
+        text_groups = row_groups[text_rows]
+        if self.sample:
+            if not is_text.all():
+                self.biggest = max(self.biggest, int(sizes[~is_text].max()))
+            self._keep_candidates(first_row + text_rows, texts, text_groups, font_keys)
+            return None
+        if texts:
+            sizes[text_rows] = _measure_column(
+                texts,
+                font_keys[0]
+                if len(font_keys) == 1
+                else [font_keys[group] for group in text_groups.tolist()],
+            )[1]
+        self.biggest = max(self.biggest, int(sizes.max()))
+        font_sizes = [style.font_size for style in group_styles]
+        return sizes, (
+            font_sizes[0]
+            if len(font_sizes) == 1
+            else [font_sizes[group] for group in row_groups.tolist()]
+        )
+
+    def _keep_candidates(
+        self,
+        rows: np.ndarray,
+        texts: list[str],
+        text_groups: np.ndarray,
+        font_keys: list[FontKey],
+    ) -> None:
+        if not texts:
+            return
+        weights = np.array(
+            [font_size or DEFAULT_FONT_SIZE for font_size, _ in font_keys],
+            dtype=np.float64,
+        )
+        lengths = np.fromiter(map(len, texts), dtype=np.float64, count=len(texts))
+        lengths *= weights[text_groups]
+        top_k = min(SAMPLE_TOP_K, len(texts))
+        longest = np.argpartition(lengths, -top_k)[-top_k:].tolist()
+        self._longest = heapq.nlargest(
+            SAMPLE_TOP_K,
+            [
+                *self._longest,
+                *(
+                    (
+                        float(lengths[idx]),
+                        int(rows[idx]),
+                        texts[idx],
+                        font_keys[text_groups[idx]],
+                    )
+                    for idx in longest
+                ),
+            ],
+        )
+        for idx in np.flatnonzero(np.isin(rows, self._random_rows)).tolist():
+            self._picked.append((texts[idx], font_keys[text_groups[idx]]))
+
+    def finish(self) -> int:
+        """
+        Biggest size of the column, measuring the sampled candidates.
+        """
+        candidates = [(text, font) for _, _, text, font in self._longest]
+        candidates.extend(self._picked)
+        if candidates:
+            size, _ = _measure_column(
+                [text for text, _ in candidates], [font for _, font in candidates]
+            )
+            self.biggest = max(self.biggest, size)
+            self._longest, self._picked = [], []
+        return self.biggest
+
+
+class _BodyColumn(NamedTuple):
+    """
+    Everything resolved once per body column, before any of its cells is written.
+    """
+
+    base_style: Style
+    base_id: int
+    style_func: StyleFunc | None
+    # Styles returned by a `vectorized` StyleFunc, one per row
+    dynamic_ids: list[int] | None
+    # fill_na / fill_zero / fill_inf replacements, by row
+    fills: dict[int, Any] | None
+
+
+def _is_zero(values: pd.Series) -> np.ndarray:
+    return (values == 0).to_numpy(dtype=bool, na_value=False)
+
+
+def _is_inf(values: pd.Series) -> np.ndarray:
+    # Only float and object columns can hold infinities, and Arrow columns of
+    # other types would cast them (inf is truthy for booleans)
+    if values.dtype.kind not in "fcO":
+        return np.zeros(len(values), dtype=bool)
+    return values.isin([np.inf, -np.inf]).to_numpy(dtype=bool, na_value=False)
+
+
+FILL_CHECKS: tuple[tuple[str, Callable[[pd.Series], np.ndarray]], ...] = (
+    ("fill_na", lambda values: values.isna().to_numpy()),
+    ("fill_zero", _is_zero),
+    ("fill_inf", _is_inf),
+)
+
+
+def _fill_settings(style: Style) -> tuple[Any, ...]:
+    return tuple(getattr(style, name) for name, _ in FILL_CHECKS)
+
+
+def _fill_values(values: pd.Series, style: Style) -> dict[int, Any]:
+    """
+    Replacements of the fill_* settings of a style over a whole column, computed
+    with one mask per setting. Like cells, replaced values are checked again by
+    the following settings.
+
+    Examples:
+        >>> values = pd.Series([1.0, np.nan, 0.0, np.inf])
+        >>> _fill_values(values, Style(fill_na="-", fill_zero="zero", fill_inf="inf"))
+        {1: '-', 2: 'zero', 3: 'inf'}
+        >>> _fill_values(values, Style(fill_na=0, fill_zero="zero"))
+        {1: 'zero', 2: 'zero'}
+    """
+    replaced = np.zeros(len(values), dtype=bool)
+    replacements = np.empty(len(values), dtype=object)
+    for name, check in FILL_CHECKS:
+        fill = getattr(style, name)
+        if fill is None:
+            continue
+        mask = np.array(check(values), dtype=bool)
+        if replaced.any():
+            mask[replaced] = check(pd.Series(replacements[replaced], dtype=object))
+        replacements[mask] = fill
+        replaced |= mask
+    idxs = np.flatnonzero(replaced)
+    return dict(zip(idxs.tolist(), replacements[idxs].tolist()))
+
+
+def _column_fills(
+    registry: StyleRegistry,
+    component: Table,
+    base_id: int,
+    row_style_ids: dict[int, int],
+    col_idx: int,
+) -> dict[int, Any] | None:
+    """
+    Fill replacements of one body column, or None when no cell is replaced.
+    Rows whose row_style changes the fill settings are computed on their own.
+    """
+    values = component.data.iloc[:, col_idx]
+    base_settings = _fill_settings(registry.styles[base_id])
+    fills = _fill_values(values, registry.styles[base_id])
+    restyled: dict[int, bool] = {}
+    for row_idx, row_style_id in row_style_ids.items():
+        if not 0 <= row_idx < len(values):
+            continue
+        merged_id = registry.merge(base_id, row_style_id)
+        if merged_id not in restyled:
+            restyled[merged_id] = (
+                _fill_settings(registry.styles[merged_id]) != base_settings
+            )
+        if restyled[merged_id]:
+            fills.pop(row_idx, None)
+            row_fills = _fill_values(values.iloc[[row_idx]], registry.styles[merged_id])
+            fills.update((row_idx, fill) for fill in row_fills.values())
+    return fills or None
+
+
+def _body_column(
+    registry: StyleRegistry,
+    component: Table,
+    default_style: Style,
+    row_style_ids: dict[int, int],
+    col: str,
+    col_idx: int,
+) -> _BodyColumn:
+    base_style = merge_styles(
+        DEFAULT_BODY_STYLE if component.default_style else None,
+        default_style,
+        component.style,
+        component.body_style,
+        _static_col_style(component, col, col_idx),
+        Style(text_wrap=True) if component.wrap_header else None,
+    )
+    _maybe = Style | StyleFunc | None
+    maybe_func_col_style: _maybe = component.column_style.get(col)
+    maybe_func_idx_col_style: _maybe = component.idx_column_style.get(col_idx)
+    maybe_func_style = maybe_func_idx_col_style or maybe_func_col_style
+    style_func: StyleFunc | None = None
+    if callable(maybe_func_style):
+        style_func: StyleFunc = cast(StyleFunc, maybe_func_style)
+    base_id = registry.intern(base_style)
+    return _BodyColumn(
+        base_style=base_style,
+        base_id=base_id,
+        style_func=style_func,
+        dynamic_ids=_dynamic_style_ids(registry, component, style_func, col_idx),
+        fills=_column_fills(registry, component, base_id, row_style_ids, col_idx),
+    )
+
+
+def _is_static_column(component: Table, column: _BodyColumn) -> bool:
+    """
+    A column is static when every one of its body cells resolves to the same
+    style, so it can be written with a single precomputed format.
+    """
+    return (
+        column.style_func is None and not component.row_style and column.fills is None
+    )
+
+
+def _resolve_value(
+    column: _BodyColumn,
+    cell: Any,
+    row_idx: int,
+) -> tuple[Any, str | None, bool]:
+    """
+    Value and url written for a body cell, and whether a fill_* replaced it.
+    """
+    if isinstance(cell, Link):
+        return cell.text, cell.url, False
+    if column.fills is not None and (fill := column.fills.get(row_idx)) is not None:
+        return fill, None, True
+    return cell, None, False
+
+
+def _cell_style_id(
+    registry: StyleRegistry,
+    column: _BodyColumn,
+    row_style_ids: dict[int, int],
+    cell: Any,
+    row: list[Any] | None,
+    row_idx: int,
+    filled: bool,
+) -> int:
+    """
+    Interned style id of a body cell whose resolved value is `cell`.
+    """
+    row_style_id = row_style_ids.get(row_idx)
+    style_id = (
+        registry.merge(column.base_id, row_style_id)
+        if row_style_id is not None
+        else column.base_id
+    )
+    if filled:
+        style_id = registry.without_numeric_format(style_id)
+    if column.dynamic_ids is not None:
+        style_id = registry.merge(style_id, column.dynamic_ids[row_idx])
+    elif column.style_func:
+        dyn_style = (
+            column.style_func(row)
+            if getattr(column.style_func, ROW_WISE_ARG, False)
+            else column.style_func(cell)
+        )
+        style_id = registry.merge(style_id, registry.intern(dyn_style))
+    if row_style_id is not None:
+        style_id = registry.merge(style_id, row_style_id)
+    return style_id
+
+
+def _resolve_block(
+    registry: StyleRegistry,
+    column: _BodyColumn,
+    row_style_ids: dict[int, int],
+    cells: list[Any],
+    rows: list[list[Any]] | None,
+    first_row: int,
+    style_ids: np.ndarray | int | None = None,
+) -> tuple[list[Any], list[str | None], np.ndarray | int, np.ndarray]:
+    """
+    Resolves the value, url and interned style id of the `cells` of one column
+    from body row `first_row`, where `rows` are only provided for `row_wise`
+    StyleFuncs. Given `style_ids` (one per cell, or one for a static column) are
+    kept instead of being resolved, so StyleFuncs are not called again.
+
+    Returns:
+        The values written, their urls, the style ids, and which values a
+        fill_* replaced.
+    """
+    resolved = []
+    urls = []
+    replaced = np.zeros(len(cells), dtype=bool)
+    ids = np.empty(len(cells), dtype=np.int32) if style_ids is None else style_ids
+    for offset, cell in enumerate(cells):
+        row_idx = first_row + offset
+        cell, url, filled = _resolve_value(column, cell, row_idx)
+        if style_ids is None:
+            ids[offset] = _cell_style_id(
+                registry,
+                column,
+                row_style_ids,
+                cell,
+                rows and rows[offset],
+                row_idx,
+                filled,
+            )
+        resolved.append(cell)
+        urls.append(url)
+        replaced[offset] = filled
+    return resolved, urls, ids, replaced
+
+
+def _row_style_ids(registry: StyleRegistry, component: Table) -> dict[int, int]:
+    return {
+        row_idx: registry.intern(style)
+        for row_idx, style in component.row_style.items()
+    }
+
+
+def _write_cell(
+    worksheet: Worksheet,
+    row: int,
+    col: int,
+    cell: Any,
+    url: str | None,
+    cell_format: Format,
+    typed_write: Callable[..., int] | None = None,
+) -> None:
+    if url is not None:
+        worksheet.write_url(row, col, url, cell_format, cell)
+    elif typed_write is not None:
+        typed_write(row, col, cell, cell_format)
+    else:
+        worksheet.write(row, col, cell, cell_format)
+
+
+def _set_column_widths(
+    worksheet: Worksheet,
+    component: Table,
+    df_columns: list[str],
+    origin: tuple[int, int],
+    column_ranges: list[tuple[int, int]],
+    header_size_cache: dict[int, tuple[int, int | None]],
+    biggest_body: dict[int, int],
+) -> dict[int, int]:
+    col_sizes = getattr(worksheet, COL_CACHE_NAME, None) or defaultdict(lambda: 0)
+    # Compare cache to body
+    for col_idx, text_size in biggest_body.items():
+        col_sizes[origin[0] + col_idx] = max(
+            text_size,
+            col_sizes[origin[0] + col_idx],
+        )
+    # Compare cache to header (considering merged spans)
+    for beg, end in column_ranges:
+        text_size = header_size_cache[beg][0]
+        cur_body_sizes = [
+            col_sizes[origin[0] + col_idx] for col_idx in range(beg, end + 1)
+        ]
+        num_cols = end - beg + 1
+        total_size = sum(cur_body_sizes)
+        diff = text_size - total_size
+        if diff > 0:
+            to_increase = diff // num_cols
+            for col_idx in range(beg, end + 1):
+                col_sizes[origin[0] + col_idx] += to_increase
+    # Hard set sizes
+    for col, width in component.column_width.items():
+        idxs = [i for i, c in enumerate(df_columns) if col == c]
+        for idx in idxs:
+            col_sizes[origin[0] + idx] = width
+    # apply constraints
+    for sheet_idx, text_size in col_sizes.items():
+        if component.min_col_size and text_size < component.min_col_size:
+            text_size = component.min_col_size
+        if component.max_col_size and text_size > component.max_col_size:
+            text_size = component.max_col_size
+        col_sizes[sheet_idx] = text_size
+        worksheet.set_column(sheet_idx, sheet_idx, col_sizes[sheet_idx])
+    setattr(worksheet, COL_CACHE_NAME, col_sizes)
+    return col_sizes
+
+
+def _set_header_height(
+    worksheet: Worksheet,
+    origin: tuple[int, int],
+    column_ranges: list[tuple[int, int]],
+    header_size_cache: dict[int, tuple[int, int | None]],
+    col_sizes: dict[int, int],
+) -> None:
+    for beg, end in column_ranges:
+        text_size, text_font = header_size_cache[beg]
+        cur_body_sizes = [
+            col_sizes[origin[0] + col_idx] for col_idx in range(beg, end + 1)
+        ]
+        line_size = sum(cur_body_sizes)
+        diff = text_size - line_size
+        if diff > 0:
+            lines_needed = math.ceil(round(text_size / line_size, 1))
+            row_height = get_row_height(lines_needed, text_font)
+            worksheet.set_row(origin[1], row_height)
+
+
+def _body_row_height(
+    row_sizes: Iterable[tuple[int, tuple[int, int | None]]],
+    col_sizes: dict[int, int],
+    origin: tuple[int, int],
+) -> float | None:
+    """
+    Height needed by the body row whose cells have the given (col_idx, (size, font))
+    measurements, or None when every cell fits its column.
+    """
+    biggest_diff = 0
+    row_size = 0
+    row_font = None
+    biggest_col_size = 0
+    for col, (cur_row, cur_font) in row_sizes:
+        col_size = col_sizes[origin[0] + col]
+        diff = cur_row - col_size
+        if diff > biggest_diff:
+            biggest_diff = diff
+            row_size = cur_row
+            biggest_col_size = col_size
+            row_font = cur_font
+    if biggest_diff <= 0:
+        return None
+    lines_needed = math.ceil(round(row_size / biggest_col_size, 1))
+    return get_row_height(lines_needed, row_font)
+
+
+class _BodySizes:
+    """
+    Text size and font size of every body cell of a wrapped table, kept as dense
+    (columns x rows) arrays: int32 sizes and uint8 codes into `font_sizes`.
+
+    Examples:
+        >>> body = _BodySizes(num_cols=2, num_rows=3)
+        >>> body.set_column(0, np.array([5, 30, 12]), 11)
+        >>> body.set_column(1, np.array([21, 8, 50]), [11, 11, 14])
+        >>> rows, heights = body.row_heights({0: 10, 1: 20}, origin=(0, 0))
+        >>> rows.tolist(), heights.round(1).tolist()
+        ([0, 1, 2], [30.8, 46.2, 58.8])
+    """
+
+    def __init__(self, num_cols: int, num_rows: int):
+        self.sizes = np.zeros((num_cols, num_rows), dtype=np.int32)
+        self.font_codes = np.zeros((num_cols, num_rows), dtype=np.uint8)
+        self.measured = np.zeros(num_cols, dtype=bool)
+        # Font size of each code, None (the default font size) included
+        self.font_sizes: list[int | None] = []
+        self._codes: dict[int | None, int] = {}
+
+    def _code(self, font_size: int | None) -> int:
+        code = self._codes.get(font_size)
+        if code is None:
+            code = len(self.font_sizes)
+            if code > np.iinfo(self.font_codes.dtype).max:
+                raise ValueError("Too many distinct font sizes in one table")
+            self._codes[font_size] = code
+            self.font_sizes.append(font_size)
+        return code
+
+    def set_column(
+        self,
+        col_idx: int,
+        sizes: np.ndarray,
+        font_sizes: list[int | None] | int | None,
+        rows: slice = slice(None),
+    ) -> None:
+        """
+        Stores the sizes of the `rows` of one column, written in one font size or
+        one per row.
+        """
+        self.sizes[col_idx, rows] = sizes
+        if isinstance(font_sizes, list):
+            self.font_codes[col_idx, rows] = [self._code(size) for size in font_sizes]
+        else:
+            self.font_codes[col_idx, rows] = self._code(font_sizes)
+        self.measured[col_idx] = True
+
+    def row_heights(
+        self,
+        col_sizes: dict[int, int],
+        origin: tuple[int, int],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized `_body_row_height` over every body row.
+
+        Returns:
+            The indices of the rows that need a height, and those heights.
+        """
+        num_rows = self.sizes.shape[1]
+        # The cell overflowing its column the most in each row, the leftmost on ties
+        best_diff = np.zeros(num_rows)
+        best_size = np.zeros(num_rows)
+        best_width = np.ones(num_rows)
+        best_code = np.zeros(num_rows, dtype=self.font_codes.dtype)
+        for col_idx in np.flatnonzero(self.measured).tolist():
+            col_size = col_sizes[origin[0] + col_idx]
+            sizes = self.sizes[col_idx]
+            diff = sizes - col_size
+            wider = diff > best_diff
+            best_diff[wider] = diff[wider]
+            best_size[wider] = sizes[wider]
+            best_width[wider] = col_size
+            best_code[wider] = self.font_codes[col_idx][wider]
+        rows = np.flatnonzero(best_diff > 0)
+        ratios = best_size[rows] / best_width[rows]
+        lines = np.ceil(np.round(ratios, 1))
+        # np.round scales by ten before rounding, which can differ from round()
+        # right at a half tenth, so those few rows take the exact path
+        tenths = ratios * 10
+        for idx in np.flatnonzero(np.abs(tenths - np.floor(tenths) - 0.5) < 1e-6):
+            lines[idx] = math.ceil(round(float(ratios[idx]), 1))
+        fonts = np.array(
+            [size or DEFAULT_FONT_SIZE for size in self.font_sizes] or [0],
+            dtype=np.float64,
+        )
+        heights = np.maximum(
+            DEFAULT_ROW_HEIGHT,
+            fonts[best_code[rows]] * DEFAULT_LINE_SPACING * lines,
+        )
+        return rows, heights
+
+
+def _body_columns(
+    registry: StyleRegistry,
+    component: Table,
+    default_style: Style,
+    row_style_ids: dict[int, int],
+) -> list[_BodyColumn]:
+    return [
+        _body_column(registry, component, default_style, row_style_ids, col, col_idx)
+        for col_idx, col in enumerate(component.data.columns)
+    ]
+
+
+def _measure_body(
+    registry: StyleRegistry,
+    component: Table,
+    columns: list[_BodyColumn],
+    row_style_ids: dict[int, int],
+    body_sizes: _BodySizes,
+) -> tuple[dict[int, int], list[list[np.ndarray | int]]]:
+    """
+    First pass over a wrapped `constant_memory` table, whose row heights must be
+    set before its rows are flushed: sizes every body cell into `body_sizes`,
+    `CONSTANT_MEMORY_BLOCK_ROWS` rows at a time, without writing anything.
+
+    Returns:
+        The biggest size of every body column, and the style ids resolved for
+        each block and column, so `_write_rows` does not call StyleFuncs again.
+    """
+    num_rows = component.data.shape[0]
+    measures = [_ColumnMeasure(num_rows) for _ in columns]
+    block_ids: list[list[np.ndarray | int]] = []
+    for first_row in range(0, num_rows, CONSTANT_MEMORY_BLOCK_ROWS):
+        block = slice(first_row, first_row + CONSTANT_MEMORY_BLOCK_ROWS)
+        rows = _style_rows(component, block)
+        block_ids.append([])
+        for col_idx, column in enumerate(columns):
+            cells, _, style_ids, replaced = _resolve_block(
+                registry,
+                column,
+                row_style_ids,
+                _column_values(component, col_idx, block),
+                rows,
+                first_row,
+                column.base_id if _is_static_column(component, column) else None,
+            )
+            block_ids[-1].append(style_ids)
+            measured = measures[col_idx].add(
+                registry,
+                first_row,
+                component.data.iloc[block, col_idx],
+                cells,
+                style_ids,
+                replaced,
+            )
+            if measured is not None:
+                body_sizes.set_column(col_idx, *measured, block)
+    return (
+        {col_idx: measure.finish() for col_idx, measure in enumerate(measures)},
+        block_ids,
+    )
+
+
+def _write_rows(
+    worksheet: Worksheet,
+    registry: StyleRegistry,
+    component: Table,
+    columns: list[_BodyColumn],
+    row_style_ids: dict[int, int],
+    origin: tuple[int, int],
+    measures: list[_ColumnMeasure] | None = None,
+    block_ids: list[list[np.ndarray | int]] | None = None,
+    row_heights: tuple[np.ndarray, np.ndarray] | None = None,
+) -> None:
+    """
+    Writes the body in strict row order for `constant_memory` worksheets, where
+    xlsxwriter flushes a row to disk as soon as a later row is written. Values
+    are extracted, styled and measured into `measures` (when auto-sizing)
+    `CONSTANT_MEMORY_BLOCK_ROWS` rows at a time.
+
+    Wrapped tables pass the `block_ids` resolved by `_measure_body`, and the
+    wrapped rows and heights from `_BodySizes.row_heights`, set right before
+    the cells of each row.
+    """
+    typed_writers = [
+        _typed_writer(worksheet, component.data.iloc[:, col_idx])
+        if column.fills is None
+        else None
+        for col_idx, column in enumerate(columns)
+    ]
+    num_rows = component.data.shape[0]
+    for block_idx, first_row in enumerate(
+        range(0, num_rows, CONSTANT_MEMORY_BLOCK_ROWS)
+    ):
+        block = slice(first_row, first_row + CONSTANT_MEMORY_BLOCK_ROWS)
+        rows = _style_rows(component, block) if block_ids is None else None
+        resolved = []
+        for col_idx, column in enumerate(columns):
+            if block_ids is not None:
+                known_ids: np.ndarray | int | None = block_ids[block_idx][col_idx]
+            elif _is_static_column(component, column):
+                known_ids = column.base_id
+            else:
+                known_ids = None
+            cells, urls, style_ids, replaced = _resolve_block(
+                registry,
+                column,
+                row_style_ids,
+                _column_values(component, col_idx, block),
+                rows,
+                first_row,
+                known_ids,
+            )
+            if measures is not None:
+                with phase("auto_size"):
+                    measures[col_idx].add(
+                        registry,
+                        first_row,
+                        component.data.iloc[block, col_idx],
+                        cells,
+                        style_ids,
+                        replaced,
+                    )
+            if isinstance(style_ids, int):
+                formats = itertools.repeat(registry.format(style_ids))
+            else:
+                formats = map(registry.format, style_ids.tolist())
+            resolved.append(list(zip(cells, urls, formats)))
+        block_heights: dict[int, float] = {}
+        if row_heights is not None:
+            wrapped_rows, heights = row_heights
+            beg, end = np.searchsorted(
+                wrapped_rows, [first_row, first_row + CONSTANT_MEMORY_BLOCK_ROWS]
+            ).tolist()
+            block_heights = dict(
+                zip(wrapped_rows[beg:end].tolist(), heights[beg:end].tolist())
+            )
+        for offset, row_cells in enumerate(zip(*resolved)):
+            row = origin[1] + first_row + offset + 1
+            if (row_height := block_heights.get(first_row + offset)) is not None:
+                worksheet.set_row(row, row_height)
+            for col_idx, (cell, url, cell_format) in enumerate(row_cells):
+                _write_cell(
+                    worksheet,
+                    row,
+                    origin[0] + col_idx,
+                    cell,
+                    url,
+                    cell_format,
+                    typed_writers[col_idx],
+                )
+
+
+def _write_columns(
+    workbook: Workbook,
+    worksheet: Worksheet,
+    registry: StyleRegistry,
+    component: Table,
+    default_style: Style,
+    row_style_ids: dict[int, int],
+    origin: tuple[int, int],
+    keep_sizes: bool,
+) -> tuple[dict[int, int], _BodySizes | None]:
+    """
+    Writes the body one column at a time, measuring each column right after
+    writing it.
+
+    Returns:
+        The biggest text size of every column, and when `keep_sizes` is set, the
+        sizes of every body cell.
+    """
+    with phase("styles"):
+        rows = _style_rows(component)
+    sample = component.auto_size and _use_sampling(component)
+    biggest_body: dict[int, int] = {}
+    body_sizes = _BodySizes(*component.data.shape[::-1]) if keep_sizes else None
+    for col_idx, col in enumerate(component.data.columns):
+        with phase("styles"):
+            column = _body_column(
+                registry, component, default_style, row_style_ids, col, col_idx
+            )
+        cells = _column_values(component, col_idx)
+        replaced = None
+        if _is_static_column(component, column):
+            _write_static_column(
+                workbook,
+                worksheet,
+                component,
+                cells,
+                col_idx,
+                column.base_style,
+                origin,
+            )
+            style_ids: np.ndarray | int = column.base_id
+        else:
+            typed_write = (
+                _typed_writer(worksheet, component.data.iloc[:, col_idx])
+                if column.fills is None
+                else None
+            )
+            cells, urls, style_ids, replaced = _resolve_block(
+                registry, column, row_style_ids, cells, rows, 0
+            )
+            for row_idx, (cell, url, style_id) in enumerate(
+                zip(cells, urls, cast(np.ndarray, style_ids).tolist())
+            ):
+                _write_cell(
+                    worksheet,
+                    origin[1] + row_idx + 1,
+                    origin[0] + col_idx,
+                    cell,
+                    url,
+                    registry.format(style_id),
+                    typed_write,
+                )
+        if component.auto_size and cells:
+            with phase("auto_size"):
+                measure = _ColumnMeasure(len(cells), sample)
+                measured = measure.add(
+                    registry,
+                    0,
+                    component.data.iloc[:, col_idx],
+                    cells,
+                    style_ids,
+                    replaced,
+                )
+                biggest_body[col_idx] = measure.finish()
+            if body_sizes is not None and measured is not None:
+                body_sizes.set_column(col_idx, *measured)
+    return biggest_body, body_sizes
+
+
+def _write_header(
+    workbook: Workbook,
+    worksheet: Worksheet,
+    component: Table,
+    df_columns: list[str],
+    default_style: Style,
+    origin: tuple[int, int],
+) -> tuple[list[tuple[int, int]], dict[int, tuple[int, int | None]]]:
+    """
+    Writes the header row, merging equal headers and adding filters.
+
+    Returns:
+        The column ranges of the header cells, and the (size, font_size) of
+        every header text when auto-sizing.
+    """
+    header_size_cache: dict[int, tuple[int, int | None]] = {}
+    base_column_range = [(idx, idx) for idx in range(len(df_columns))]
+    column_ranges = list(base_column_range)
+    prev = None
+    prev_format = None
+    min_idx = 0
+    for col_idx, cur_col in enumerate(df_columns):
+        header_style = merge_styles(
+            DEFAULT_HEADER_STYLE if component.default_style else None,
+            default_style,
+            component.style,
+            component.header_style.get(cur_col),
+            Style(text_wrap=True) if component.wrap_header else None,
+        )
+        header_format = process_style(workbook, [header_style])
+        worksheet.write(origin[1], origin[0] + col_idx, cur_col, header_format)
+        if component.merge_equal_headers:
+            last_idx = len(df_columns) - 1
+            group_ends = prev is not None and (cur_col != prev or col_idx == last_idx)
+            end_idx = (
+                col_idx if (col_idx == last_idx and cur_col == prev) else col_idx - 1
+            )
+            if group_ends:
+                if end_idx > min_idx:
+                    worksheet.merge_range(
+                        first_row=origin[1],
+                        first_col=origin[0] + min_idx,
+                        last_row=origin[1],
+                        last_col=origin[0] + end_idx,
+                        data=prev,
+                        cell_format=prev_format,
+                    )
+                    for _idx in range(min_idx, end_idx + 1):
+                        column_ranges.remove((_idx, _idx))
+                    column_ranges.append((min_idx, end_idx))
+                    column_ranges.sort(key=lambda x: x[0])
+                min_idx = col_idx
+            prev = cur_col
+            prev_format = header_format
+        if component.auto_size:
+            header_size_cache[col_idx] = (
+                get_text_size(
+                    cur_col,
+                    header_style.font_size,
+                    header_style.font_family,
+                ),
+                header_style.font_size,
+            )
+
+    # =============================== Header filters ===============================
+    actually_merged = set(base_column_range) != set(column_ranges)
+    if component.header_filters and not actually_merged:
+        worksheet.autofilter(
+            origin[1],
+            origin[0],
+            origin[1],
+            origin[0] + len(df_columns) - 1,
+        )
+    return column_ranges, header_size_cache
+
+
+def _chunk_row_style(
+    row_style: dict[int, Style],
+    styled_rows: list[int],
+    offset: int,
+    num_rows: int,
+) -> dict[int, Style]:
+    """
+    Row styles of the chunk starting at row `offset`, keyed by row within it,
+    where `styled_rows` are the sorted keys of `row_style`.
+
+    Examples:
+        >>> row_style = {0: Style(bold=True), 5: Style(bold=False)}
+        >>> _chunk_row_style(row_style, sorted(row_style), 4, 2)
+        {1: Style(...bold=False...)}
+    """
+    beg = bisect.bisect_left(styled_rows, offset)
+    end = bisect.bisect_left(styled_rows, offset + num_rows, lo=beg)
+    return {row_idx - offset: row_style[row_idx] for row_idx in styled_rows[beg:end]}
+
+
+def _write_table_source(
+    workbook: Workbook,
+    worksheet: Worksheet,
+    component: Table,
+    default_style: Style,
+    origin: tuple[int, int],
+) -> tuple[int, int]:
+    """
+    Writes a table whose data is a `TableSource`, one chunk at a time below a
+    single header. Auto-size keeps a running maximum of the column widths, set
+    once the last chunk is written; body row heights are left as is.
+    """
+    source = cast(TableSource, component.data)
+    chunks = source.chunks()
+    first = next(chunks, None)
+    if first is None:
+        return 0, 1
+    df_columns = list(first.columns)
+    with phase("header"):
+        column_ranges, header_size_cache = _write_header(
+            workbook, worksheet, component, df_columns, default_style, origin
+        )
+    registry = get_style_registry(workbook)
+    biggest_body: dict[int, int] = defaultdict(lambda: 0)
+    styled_rows = sorted(component.row_style)
+    offset = 0
+    for chunk in itertools.chain([first], chunks):
+        if list(chunk.columns) != df_columns:
+            raise ValueError(
+                f"Chunk columns {list(chunk.columns)} do not match {df_columns}"
+            )
+        part = component.model_copy(
+            update={
+                "data": chunk,
+                "row_style": _chunk_row_style(
+                    component.row_style, styled_rows, offset, chunk.shape[0]
+                ),
+            }
+        )
+        part_origin = (origin[0], origin[1] + offset)
+        with phase("styles"):
+            row_style_ids = _row_style_ids(registry, part)
+        if worksheet.constant_memory:
+            with phase("styles"):
+                columns = _body_columns(registry, part, default_style, row_style_ids)
+            measures = (
+                [_ColumnMeasure(chunk.shape[0], _use_sampling(part)) for _ in columns]
+                if component.auto_size
+                else None
+            )
+            _write_rows(
+                worksheet, registry, part, columns, row_style_ids, part_origin, measures
+            )
+            if measures is not None:
+                with phase("auto_size"):
+                    chunk_body = {
+                        idx: measure.finish() for idx, measure in enumerate(measures)
+                    }
+        else:
+            chunk_body, _ = _write_columns(
+                workbook,
+                worksheet,
+                registry,
+                part,
+                default_style,
+                row_style_ids,
+                part_origin,
+                keep_sizes=False,
+            )
+        if component.auto_size:
+            for col_idx, size in chunk_body.items():
+                biggest_body[col_idx] = max(biggest_body[col_idx], size)
+        offset += chunk.shape[0]
+
+    if component.auto_size:
+        with phase("auto_size"):
+            col_sizes = _set_column_widths(
+                worksheet,
+                component,
+                df_columns,
+                origin,
+                column_ranges,
+                header_size_cache,
+                biggest_body,
+            )
+        if component.wrap_header and not worksheet.constant_memory:
+            with phase("row_heights"):
+                _set_header_height(
+                    worksheet, origin, column_ranges, header_size_cache, col_sizes
+                )
+    return len(df_columns), offset + 1
+
+
+def write_table(
+    workbook: Workbook,
+    worksheet: Worksheet,
+    component: Table,
+    default_style: Style,
+    origin: tuple[int, int] = (0, 0),
+) -> tuple[int, int]:
+    """
+    Examples:
+        >>> n = 30_000
+        >>> data = pd.DataFrame({"A": [1, 2, 3] * n, "B": [4, "ha" * 50, 6] * n, "C": [4, 5, 6] * n})
+        >>> long_text = "This is an avocado toast" * 3
+        >>> data.rename(columns={"A": long_text, "B": long_text}, inplace=True)
+        >>> origin = (0, 0)
+        >>> default_style = Style(align="center", valign="vcenter")
+        >>> row_style = {1: Style(font_size=14)}
+        >>> component = Table(data=data, row_style=row_style, min_col_size=10, max_col_size=20, wrap_header=True)
+        >>> import xlsxwriter
+        >>> workbook = xlsxwriter.Workbook("output.xlsx")
+        >>> worksheet = workbook.add_worksheet()
+        >>> _ = write_table(workbook, worksheet, component, default_style)
+        >>> workbook.close()
+    """
+    if isinstance(component.data, TableSource):
+        return _write_table_source(
+            workbook, worksheet, component, default_style, origin
+        )
+    x_size = component.data.shape[1]
+    y_size = component.data.shape[0] + 1
+    df_columns = list(component.data.columns)
+
+    # =============================== Write headers ================================
+    with phase("header"):
+        column_ranges, header_size_cache = _write_header(
+            workbook, worksheet, component, df_columns, default_style, origin
+        )
+
+    # ================================= Write body =================================
+    registry = get_style_registry(workbook)
+    with phase("styles"):
+        row_style_ids = _row_style_ids(registry, component)
+    if worksheet.constant_memory:
+        with phase("styles"):
+            columns = _body_columns(registry, component, default_style, row_style_ids)
+        if not (component.auto_size and component.wrap_header):
+            # Column widths can be set after the rows are flushed, so the body
+            # is measured while it is written
+            measures = (
+                [
+                    _ColumnMeasure(component.data.shape[0], _use_sampling(component))
+                    for _ in columns
+                ]
+                if component.auto_size
+                else None
+            )
+            _write_rows(
+                worksheet, registry, component, columns, row_style_ids, origin, measures
+            )
+            if measures is not None:
+                with phase("auto_size"):
+                    _set_column_widths(
+                        worksheet,
+                        component,
+                        df_columns,
+                        origin,
+                        column_ranges,
+                        header_size_cache,
+                        {idx: measure.finish() for idx, measure in enumerate(measures)},
+                    )
+            return x_size, y_size
+        # Header and body row heights must be set before their rows are flushed,
+        # so the body is measured in a first pass
+        body_sizes = _BodySizes(*component.data.shape[::-1])
+        with phase("auto_size"):
+            biggest_body, block_ids = _measure_body(
+                registry, component, columns, row_style_ids, body_sizes
+            )
+            col_sizes = _set_column_widths(
+                worksheet,
+                component,
+                df_columns,
+                origin,
+                column_ranges,
+                header_size_cache,
+                biggest_body,
+            )
+        with phase("row_heights"):
+            _set_header_height(
+                worksheet, origin, column_ranges, header_size_cache, col_sizes
+            )
+            row_heights = body_sizes.row_heights(col_sizes, origin)
+        _write_rows(
+            worksheet,
+            registry,
+            component,
+            columns,
+            row_style_ids,
+            origin,
+            block_ids=block_ids,
+            row_heights=row_heights,
+        )
+        return x_size, y_size
+
+    biggest_body, body_sizes = _write_columns(
+        workbook,
+        worksheet,
+        registry,
+        component,
+        default_style,
+        row_style_ids,
+        origin,
+        keep_sizes=component.auto_size and component.wrap_header,
+    )
+
+    # =============================== Auto Set Width ===============================
+    if component.auto_size:
+        with phase("auto_size"):
+            col_sizes = _set_column_widths(
+                worksheet,
+                component,
+                df_columns,
+                origin,
+                column_ranges,
+                header_size_cache,
+                biggest_body,
+            )
+        if component.wrap_header:
+            with phase("row_heights"):
+                _set_header_height(
+                    worksheet, origin, column_ranges, header_size_cache, col_sizes
+                )
+                # row wrap body
+                if body_sizes is not None:
+                    wrapped_rows, heights = body_sizes.row_heights(col_sizes, origin)
+                    first_row = origin[1] + 1
+                    for row_idx, row_height in zip(
+                        wrapped_rows.tolist(), heights.tolist()
+                    ):
+                        worksheet.set_row(first_row + row_idx, row_height)
+
+    return x_size, y_size
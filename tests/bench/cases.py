@@ -0,0 +1,179 @@
+"""
+Benchmark cases: a data shape (rows x columns of one dtype) rendered either by
+excelipy with a set of style features, or by a baseline writer
+(`pandas.DataFrame.to_excel`, raw xlsxwriter) for the same data.
+"""
+
+import io
+import itertools
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+import excelipy as ep
+
+DTYPES = ("int", "float", "str", "datetime", "mixed")
+
+# Style features of the excelipy cases, each one on top of the default table
+FEATURES = (
+    "plain",
+    "no_auto_size",
+    "wrap_header",
+    "merge_equal_headers",
+    "style_func",
+    "vectorized_style_func",
+    "stripes",
+    "multi_sheet",
+    "constant_memory",
+)
+
+BASELINES = ("pandas", "xlsxwriter")
+
+MULTI_SHEET_COUNT = 4
+
+
+@dataclass(frozen=True)
+class BenchCase:
+    rows: int
+    cols: int
+    dtype: str
+    # A FEATURES entry for excelipy, or a BASELINES entry
+    feature: str = "plain"
+
+    @property
+    def name(self) -> str:
+        return f"{self.feature}-{self.dtype}-{self.rows}x{self.cols}"
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, **asdict(self)}
+
+
+def make_frame(rows: int, cols: int, dtype: str, seed: int = 0) -> pd.DataFrame:
+    """
+    Reproducible frame of the given shape. "mixed" cycles through the other
+    dtypes column by column, with a few missing floats.
+
+    >>> [dtype.kind for dtype in make_frame(3, 5, "mixed").dtypes]
+    ['i', 'f', 'O', 'M', 'i']
+    """
+    rng = np.random.default_rng(seed)
+
+    def column(kind: str) -> np.ndarray | pd.Series:
+        if kind == "int":
+            return rng.integers(0, 1_000_000, rows)
+        if kind == "float":
+            values = rng.normal(1_000, 250, rows)
+            values[rng.random(rows) < 0.05] = np.nan
+            return values
+        if kind == "str":
+            words = np.array(["alpha", "beta", "gamma", "delta tau", "epsilon phi"])
+            return words[rng.integers(0, len(words), rows)]
+        if kind == "datetime":
+            start = np.datetime64("2020-01-01")
+            return start + rng.integers(0, 2_000, rows).astype("timedelta64[D]")
+        raise ValueError(f"Unknown dtype {kind}")
+
+    kinds = (
+        itertools.cycle(DTYPES[:-1]) if dtype == "mixed" else itertools.repeat(dtype)
+    )
+    return pd.DataFrame(
+        {f"column {idx}": column(kind) for idx, kind in zip(range(cols), kinds)}
+    )
+
+
+def highlight_large(value) -> ep.Style:
+    return (
+        ep.Style(bold=True)
+        if isinstance(value, int) and value > 500_000
+        else ep.Style()
+    )
+
+
+@ep.vectorized
+def highlight_large_column(column: pd.Series) -> list:
+    bold = ep.Style(bold=True)
+    if column.dtype.kind not in "iu":
+        return [None] * len(column)
+    return [bold if value else None for value in column.gt(500_000)]
+
+
+def excelipy_excel(case: BenchCase, df: pd.DataFrame, path: io.BytesIO) -> ep.Excel:
+    options: dict = {}
+    feature = case.feature
+    if feature == "no_auto_size":
+        options["auto_size"] = False
+    elif feature == "wrap_header":
+        options["wrap_header"] = True
+    elif feature == "merge_equal_headers":
+        # Pairs of equal column names, merged into one header cell each
+        df = df.set_axis([f"group {idx // 2}" for idx in range(df.shape[1])], axis=1)
+        options["merge_equal_headers"] = True
+    elif feature in ("style_func", "vectorized_style_func"):
+        func = highlight_large if feature == "style_func" else highlight_large_column
+        options["column_style"] = {column: func for column in df.columns}
+    table = ep.Table(data=df, **options)
+    if feature == "stripes":
+        table = table.with_stripes()
+    sheet_count = MULTI_SHEET_COUNT if feature == "multi_sheet" else 1
+    return ep.Excel(
+        path=path,
+        sheets=[
+            ep.Sheet(name=f"Sheet{idx + 1}", components=[table])
+            for idx in range(sheet_count)
+        ],
+        constant_memory=feature == "constant_memory",
+    )
+
+
+def write_excelipy(case: BenchCase, df: pd.DataFrame, path: io.BytesIO) -> None:
+    ep.save(excelipy_excel(case, df, path))
+
+
+def write_pandas(case: BenchCase, df: pd.DataFrame, path: io.BytesIO) -> None:
+    df.to_excel(path, index=False, engine="xlsxwriter")
+
+
+def write_xlsxwriter(case: BenchCase, df: pd.DataFrame, path: io.BytesIO) -> None:
+    with xlsxwriter.Workbook(path, {"nan_inf_to_errors": True}) as workbook:
+        worksheet = workbook.add_worksheet()
+        date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+        worksheet.write_row(0, 0, df.columns)
+        for col_idx, (_, column) in enumerate(df.items()):
+            cell_format = date_format if column.dtype.kind == "M" else None
+            worksheet.write_column(1, col_idx, column.tolist(), cell_format)
+
+
+WRITERS: dict[str, Callable[[BenchCase, pd.DataFrame, io.BytesIO], None]] = {
+    "pandas": write_pandas,
+    "xlsxwriter": write_xlsxwriter,
+}
+
+
+def writer_for(
+    case: BenchCase,
+) -> Callable[[BenchCase, pd.DataFrame, io.BytesIO], None]:
+    return WRITERS.get(case.feature, write_excelipy)
+
+
+def build_cases(
+    rows: list[int],
+    cols: list[int],
+    dtypes: list[str],
+    features: list[str],
+    baselines: bool = True,
+) -> list[BenchCase]:
+    """
+    Every feature and baseline over every shape and dtype.
+
+    >>> [c.name for c in build_cases([10], [2], ["int"], ["plain"], baselines=True)]
+    ['plain-int-10x2', 'pandas-int-10x2', 'xlsxwriter-int-10x2']
+    """
+    kinds = [*features, *(BASELINES if baselines else ())]
+    return [
+        BenchCase(n_rows, n_cols, dtype, kind)
+        for n_rows, n_cols, dtype in itertools.product(rows, cols, dtypes)
+        for kind in kinds
+    ]
@@ -0,0 +1,44 @@
+"""
+Cold import cost of excelipy, measured in fresh interpreters.
+"""
+
+import json
+import subprocess
+import sys
+
+# Modules `import excelipy` must not load by itself
+HEAVY_MODULES = ("pandas", "numpy", "PIL", "pydantic", "xlsxwriter")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "ms": elapsed * 1000,
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure_import(module: str = "excelipy", repeat: int = 5) -> dict:
+    """
+    Best import time in milliseconds over `repeat` fresh interpreters, and the
+    heavy modules the import loaded.
+    """
+    runs = [
+        json.loads(
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    _PROBE.format(module=module, heavy=HEAVY_MODULES),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(repeat)
+    ]
+    return {"best_ms": min(run["ms"] for run in runs), "loaded": runs[0]["loaded"]}
@@ -0,0 +1,175 @@
+"""
+Runs the benchmark cases, one fresh process per case so peak RSS is not shared
+between cases, and prints the cold import time of excelipy followed by a table
+of wall time, peak RSS, output size and format count. Results can be saved to
+JSON and diffed against an earlier run:
+
+    python -m tests.bench.run --rows 10000 100000 --json bench.json
+    python -m tests.bench.run --rows 10000 100000 --compare bench.json
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import platform
+import re
+import statistics
+import sys
+import time
+import zipfile
+from dataclasses import asdict, dataclass
+
+import pandas as pd
+import xlsxwriter
+
+from tests.bench.cases import (
+    BASELINES,
+    DTYPES,
+    FEATURES,
+    BenchCase,
+    build_cases,
+    make_frame,
+    writer_for,
+)
+from tests.bench.imports import measure_import
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+@dataclass
+class BenchResult:
+    case: dict
+    wall_seconds: list[float]
+    peak_rss_mb: float | None
+    output_bytes: int
+    format_count: int
+
+    @property
+    def best(self) -> float:
+        return min(self.wall_seconds)
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def count_formats(data: bytes) -> int:
+    """
+    Cell formats (xf records) of an xlsx, whichever library wrote it.
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        styles = zf.read("xl/styles.xml").decode()
+    match = re.search(r'<cellXfs count="(\d+)"', styles)
+    return int(match.group(1)) if match else 0
+
+
+def run_case(case: BenchCase, repeat: int = 1) -> BenchResult:
+    """
+    Renders the case `repeat` times in this process.
+
+    >>> result = run_case(BenchCase(20, 3, "mixed", "stripes"))
+    >>> result.output_bytes > 0, result.format_count > 1
+    (True, True)
+    """
+    df = make_frame(case.rows, case.cols, case.dtype)
+    write = writer_for(case)
+    timings = []
+    data = b""
+    for _ in range(repeat):
+        out = io.BytesIO()
+        start = time.perf_counter()
+        write(case, df, out)
+        timings.append(time.perf_counter() - start)
+        data = out.getvalue()
+    return BenchResult(
+        case=case.to_dict(),
+        wall_seconds=timings,
+        peak_rss_mb=_peak_rss_mb(),
+        output_bytes=len(data),
+        format_count=count_formats(data),
+    )
+
+
+def run_isolated(case: BenchCase, repeat: int) -> BenchResult:
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_case, (case, repeat))
+
+
+def _format_row(result: BenchResult, previous: BenchResult | None) -> str:
+    rss = "-" if result.peak_rss_mb is None else f"{result.peak_rss_mb:.0f}"
+    row = (
+        f"{result.case['name']:<42} {result.best:>9.3f} "
+        f"{statistics.median(result.wall_seconds):>9.3f} {rss:>8} "
+        f"{result.output_bytes / 1024:>10.0f} {result.format_count:>7}"
+    )
+    if previous is not None:
+        row += f" {result.best / previous.best:>7.2f}x"
+    return row
+
+
+def main(argv: list[str] | None = None) -> list[BenchResult]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--cols", type=int, nargs="+", default=[10])
+    parser.add_argument("--dtypes", nargs="+", choices=DTYPES, default=["mixed"])
+    parser.add_argument("--features", nargs="+", choices=FEATURES, default=FEATURES)
+    parser.add_argument("--no-baselines", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Saves the results to this file")
+    parser.add_argument("--compare", help="Results JSON to compare best times with")
+    args = parser.parse_args(argv)
+
+    previous: dict[str, BenchResult] = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {
+                r["case"]["name"]: BenchResult(**r) for r in json.load(f)["results"]
+            }
+
+    cases = build_cases(
+        args.rows, args.cols, args.dtypes, args.features, not args.no_baselines
+    )
+    import_time = measure_import()
+    print(f"import excelipy: {import_time['best_ms']:.1f} ms")
+    print(
+        f"{'case':<42} {'best s':>9} {'median s':>9} {'rss MB':>8} "
+        f"{'size KB':>10} {'formats':>7}" + (" vs prev" if previous else "")
+    )
+    results = []
+    for case in cases:
+        result = run_isolated(case, args.repeat)
+        results.append(result)
+        print(_format_row(result, previous.get(case.name)), flush=True)
+
+    if args.json:
+        environment = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "xlsxwriter": xlsxwriter.__version__,
+            "baselines": BASELINES,
+        }
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "environment": environment,
+                    "import": import_time,
+                    "results": [asdict(result) for result in results],
+                },
+                f,
+                indent=2,
+            )
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.bench import run
+from tests.bench.cases import BASELINES, FEATURES, BenchCase
+from tests.bench.imports import measure_import
+
+
+@pytest.mark.parametrize("feature", [*FEATURES, *BASELINES])
+def test_case_renders(feature: str):
+    result = run.run_case(BenchCase(50, 4, "mixed", feature), repeat=2)
+    assert len(result.wall_seconds) == 2
+    assert result.output_bytes > 0
+    assert result.format_count > 0
+
+
+def test_results_json(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(run, "run_isolated", run.run_case)
+    out = tmp_path / "bench.json"
+    argv = ["--rows", "20", "--cols", "3", "--features", "plain", "--repeat", "1"]
+    results = run.main([*argv, "--json", str(out)])
+    saved = json.loads(out.read_text())
+    assert [r["case"]["name"] for r in saved["results"]] == [
+        "plain-mixed-20x3",
+        "pandas-mixed-20x3",
+        "xlsxwriter-mixed-20x3",
+    ]
+    assert run.main([*argv, "--compare", str(out)])[0].case == results[0].case
+
+
+def test_import_is_lazy():
+    assert measure_import(repeat=1)["loaded"] == []
+
+
+def test_lazy_attributes():
+    import excelipy as ep
+
+    assert "Table" in dir(ep)
+    assert ep.AI_GUIDE.startswith("#")
+    with pytest.raises(AttributeError):
+        ep.missing
+
+
+def test_lazy_submodules():
+    code = (
+        "import excelipy\n"
+        "print(excelipy.style.merge_styles.__module__, excelipy.writers.table.__name__)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    assert out.stdout.split() == ["excelipy.style", "excelipy.writers.table"]
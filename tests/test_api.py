@@ -1,15 +1,37 @@
+import asyncio
 import importlib.resources as pkg_resources
 import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import zipfile
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 import pytest
+import xlsxwriter
 
 import excelipy as ep
+from excelipy import cache as cache_module
+from excelipy import caches, service
+from excelipy.cache import OutputCache, _func_digest, excel_digest
+from excelipy.plan import SheetPlan, replay_plan
 from tests import resources
 
 
+def highlight_ones(value) -> ep.Style:
+    return ep.Style(bold=True) if value == 1 else ep.Style()
+
+
+@ep.cache_key("highlight-flags-v1")
+def highlight_flags(value) -> ep.Style:
+    flags = [str(v).lower() for v in (value,)]
+    return ep.Style(bold=any(f in {"1", "yes", "true"} for f in flags))
+
+
 @pytest.fixture
 def resources_path() -> Path:
     return Path(str(pkg_resources.files(resources)))
@@ -291,5 +313,341 @@ def test_big_columns():
     )
 
 
+def test_constant_memory(sample_df: pd.DataFrame, big_merged_df: pd.DataFrame):
+    out = io.BytesIO()
+    ep.save(
+        ep.Excel(
+            path=out,
+            constant_memory=True,
+            sheets=[
+                ep.Sheet(
+                    name="Sheet1",
+                    components=[
+                        ep.Text(text="Title", width=3),
+                        ep.Table(
+                            data=sample_df,
+                            row_style={1: ep.Style(bold=True)},
+                            column_style={"testing2": lambda _: ep.Style()},
+                        ),
+                        ep.Table(data=big_merged_df, wrap_header=True),
+                    ],
+                )
+            ],
+        )
+    )
+    with zipfile.ZipFile(out) as zf:
+        sheet_xml = zf.read("xl/worksheets/sheet1.xml").decode()
+    assert 'r="A1"' in sheet_xml
+    assert 'r="C9"' in sheet_xml
+    assert "inlineStr" in sheet_xml
+    assert "Thanks" in sheet_xml
+    assert 'customHeight="1"' in sheet_xml
+
+
+def _xlsx_parts(out: io.BytesIO) -> dict[str, bytes]:
+    with zipfile.ZipFile(out) as zf:
+        return {name: zf.read(name) for name in zf.namelist() if "docProps" not in name}
+
+
+@pytest.mark.parametrize("constant_memory", [False, True])
+def test_save_workers(
+    sample_df: pd.DataFrame,
+    big_merged_df: pd.DataFrame,
+    img_path: Path,
+    constant_memory: bool,
+):
+    sheets = [
+        ep.Sheet(
+            name="Planned",
+            components=[
+                ep.Text(text="Title", width=3, style=ep.Style(bold=True)),
+                ep.Table(data=sample_df, column_style={"testing": highlight_ones}),
+                ep.Image(path=img_path, width=2, height=3),
+            ],
+            grid_lines=False,
+        ),
+        ep.Sheet(
+            name="Local",
+            components=[
+                ep.Table(data=sample_df, column_style={"testing": lambda _: ep.Style()})
+            ],
+        ),
+        ep.Sheet(
+            name="Wrapped",
+            components=[ep.Table(data=big_merged_df, wrap_header=True)],
+        ),
+    ]
+    outputs = []
+    for workers in (None, 2):
+        out = io.BytesIO()
+        excel = ep.Excel(path=out, sheets=sheets, constant_memory=constant_memory)
+        ep.save(excel, workers=workers)
+        outputs.append(_xlsx_parts(out))
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize("constant_memory", [False, True])
+def test_plan_round_trip(
+    sample_df: pd.DataFrame, img_path: Path, constant_memory: bool
+):
+    df = sample_df.assign(when=pd.Timestamp("2024-01-31"))
+    sheet = ep.Sheet(
+        name="S",
+        components=[
+            ep.Text(text="Title", width=3, style=ep.Style(bold=True)),
+            ep.Table(data=df, column_style={"testing": highlight_ones}),
+            ep.Link(text="Docs", url="https://example.com"),
+            ep.Image(path=img_path, width=2, height=3),
+        ],
+    )
+    plan = ep.plan_sheet(sheet, constant_memory)
+    assert plan.merges[0][:5] == (0, 0, 0, 2, "Title")
+    assert plan.column_widths
+    assert (1, 0, "testing", plan.cells()[1][3]) in plan.cells()
+    restored = SheetPlan.from_dict(json.loads(json.dumps(plan.to_dict())))
+    assert restored.cells() == plan.cells()
+
+    expected = io.BytesIO()
+    ep.save(ep.Excel(path=expected, sheets=[sheet], constant_memory=constant_memory))
+    replayed = io.BytesIO()
+    options = {"constant_memory": constant_memory, "nan_inf_to_errors": True}
+    with xlsxwriter.Workbook(replayed, options) as workbook:
+        replay_plan(restored, workbook, workbook.add_worksheet("S"))
+    assert _xlsx_parts(replayed) == _xlsx_parts(expected)
+
+
+def test_save_cache(
+    sample_df: pd.DataFrame, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    renders = []
+    write_workbook = service._write_workbook
+    monkeypatch.setattr(
+        service,
+        "_write_workbook",
+        lambda excel, *args: renders.append(excel) or write_workbook(excel, *args),
+    )
+    cache = OutputCache(tmp_path / "cache")
+
+    def save(df: pd.DataFrame, style=highlight_flags) -> bytes:
+        out = io.BytesIO()
+        table = ep.Table(data=df, column_style={"testing": style})
+        sheet = ep.Sheet(name="S", components=[ep.Group(components=[table])])
+        ep.save(ep.Excel(path=out, sheets=[sheet]), cache=cache)
+        return out.getvalue()
+
+    first = save(sample_df)
+    assert save(sample_df.copy()) == first
+    assert len(renders) == 1
+    assert save(sample_df.assign(testing=2)) != first
+    assert len(renders) == 2
+    assert save(sample_df, style=lambda _: ep.Style()) != b""
+    assert save(sample_df, style=highlight_ones) == save(sample_df, highlight_ones)
+    assert len(renders) == 5
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+
+
+def test_save_cache_object_cells(tmp_path: Path):
+    cache = OutputCache(tmp_path / "cache")
+
+    def save(*cells) -> bytes:
+        out = io.BytesIO()
+        table = ep.Table(data=pd.DataFrame({"cells": cells}))
+        ep.save(
+            ep.Excel(path=out, sheets=[ep.Sheet(name="S", components=[table])]),
+            cache=cache,
+        )
+        return out.getvalue()
+
+    home = save(ep.Link(text="Home", url="https://example.com"), 1)
+    other = save(ep.Link(text="Home", url="https://example.org"), 1)
+    assert (
+        b"https://example.org"
+        in _xlsx_parts(io.BytesIO(other))["xl/worksheets/_rels/sheet1.xml.rels"]
+    )
+    assert other != home
+    assert save(ep.Link(text="Home", url="https://example.com"), "1") != home
+    assert len(list((tmp_path / "cache").iterdir())) == 3
+
+
+def test_excel_digest_versions(
+    sample_df: pd.DataFrame, monkeypatch: pytest.MonkeyPatch
+):
+    excel = ep.Excel(
+        path=io.BytesIO(),
+        sheets=[ep.Sheet(name="S", components=[ep.Table(data=sample_df)])],
+    )
+    digest = excel_digest(excel)
+    assert excel_digest(excel) == digest
+    monkeypatch.setattr(cache_module, "_package_version", lambda: "99.0")
+    upgraded = excel_digest(excel)
+    assert upgraded != digest
+    # Another font file behind the default font changes the column widths
+    monkeypatch.setattr(cache_module, "font_cache_key", lambda *_: "other-font")
+    assert excel_digest(excel) not in (digest, upgraded)
+
+
+def test_cache_key_digest():
+    assert _func_digest(highlight_ones) is None
+    assert _func_digest(lambda _: ep.Style()) is None
+    keyed = _func_digest(highlight_flags)
+    assert keyed is not None
+    assert _func_digest(ep.cache_key("v2")(lambda _: ep.Style())) is not None
+
+    # Nested code objects and set constants hash the same in another process
+    code = (
+        "from excelipy.cache import _func_digest\n"
+        "from tests.test_api import highlight_flags\n"
+        "print(_func_digest(highlight_flags))"
+    )
+    seed = "1" if os.environ.get("PYTHONHASHSEED") != "1" else "2"
+    other = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, "PYTHONHASHSEED": seed},
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert other.stdout.strip() == keyed
+
+    def rekeyed(value) -> ep.Style:
+        return highlight_flags(value)
+
+    digests = {_func_digest(ep.cache_key(k)(rekeyed)) for k in ("a", "b")}
+    assert len(digests) == 2
+
+
+def test_render_stats(sample_df: pd.DataFrame, img_path: Path, tmp_path: Path):
+    path = tmp_path / "stats.xlsx"
+    table = ep.Table(data=sample_df, wrap_header=True)
+    sheet = ep.Sheet(
+        name="S",
+        components=[
+            ep.Text(text="Title", width=2),
+            table,
+            ep.Image(path=img_path, width=2, height=2),
+        ],
+    )
+    stats = ep.save(ep.Excel(path=path, sheets=[sheet]))
+
+    assert stats.bytes_written == path.stat().st_size
+    assert stats.formats_created > 0 and not stats.cached
+    text, table_stats, image = stats.sheets[0].components
+    assert (text.type, text.cells) == ("text", 2)
+    assert table_stats.cells == sample_df.shape[1] * (sample_df.shape[0] + 1)
+    assert {"header", "styles", "auto_size", "row_heights", "write"} <= set(
+        table_stats.phases
+    )
+    assert "image" in image.phases
+    totals = stats.phase_totals()
+    assert totals["close"] > 0
+    assert sum(c.elapsed for c in stats.sheets[0].components) <= stats.elapsed
+    assert json.dumps(stats.to_dict())
+
+
+def test_scoped_bounded_caches(sample_df: pd.DataFrame):
+    def render():
+        table = ep.Table(data=sample_df, header_style={"testing": ep.Style(bold=True)})
+        sheet = ep.Sheet(name="S", components=[table])
+        ep.save(ep.Excel(path=io.BytesIO(), sheets=[sheet]))
+
+    maxsize = caches.cache_stats()["merge_styles"].maxsize
+    caches.set_cache_size("merge_styles", 2)
+    try:
+        with caches.scoped_caches():
+            render()
+            render()
+            stats = caches.cache_stats()["merge_styles"]
+            assert stats.size == 2 and stats.maxsize == 2
+            assert stats.hits and 0 < stats.hit_rate < 1
+        after = caches.cache_stats()["merge_styles"]
+        assert after.size == 0
+        assert (after.hits, after.misses) == (stats.hits, stats.misses)
+    finally:
+        caches.set_cache_size("merge_styles", maxsize)
+    with pytest.raises(KeyError):
+        caches.set_cache_size("missing", 1)
+
+
+def test_save_many(sample_df: pd.DataFrame, tmp_path: Path):
+    def excel(path, name: str = "Sheet1", style=highlight_ones) -> ep.Excel:
+        table = ep.Table(data=sample_df, column_style={"testing": style})
+        return ep.Excel(path=path, sheets=[ep.Sheet(name=name, components=[table])])
+
+    expected = io.BytesIO()
+    ep.save(excel(expected))
+    excels = [
+        excel(tmp_path / "on_disk.xlsx"),
+        excel(io.BytesIO()),
+        excel(io.BytesIO(), name="Invalid sheet name with [brackets]"),
+        excel(io.BytesIO(), style=lambda _: ep.Style()),
+    ]
+    results = ep.save_many(excels, workers=2)
+
+    assert [result.ok for result in results] == [True, True, False, True]
+    assert all(result.elapsed >= 0 for result in results)
+    assert results[1].path is excels[1].path
+    assert _xlsx_parts(excels[1].path) == _xlsx_parts(expected)
+    with open(tmp_path / "on_disk.xlsx", "rb") as f:
+        assert _xlsx_parts(io.BytesIO(f.read())) == _xlsx_parts(expected)
+    assert _xlsx_parts(excels[3].path)
+
+
+def test_save_async(sample_df: pd.DataFrame):
+    def excel(path: io.BytesIO) -> ep.Excel:
+        table = ep.Table(data=sample_df, column_style={"testing": highlight_ones})
+        return ep.Excel(path=path, sheets=[ep.Sheet(name="S", components=[table])])
+
+    expected = io.BytesIO()
+    ep.save(excel(expected))
+
+    async def render_all() -> list[io.BytesIO]:
+        outputs = [io.BytesIO() for _ in range(4)]
+        await asyncio.gather(*(ep.save_async(excel(out)) for out in outputs))
+        return outputs
+
+    for out in asyncio.run(render_all()):
+        assert _xlsx_parts(out) == _xlsx_parts(expected)
+
+
+def test_save_async_cancel(sample_df: pd.DataFrame):
+    started = threading.Event()
+    release = threading.Event()
+    later_calls = []
+
+    def blocking(_) -> ep.Style:
+        started.set()
+        release.wait(timeout=10)
+        return ep.Style()
+
+    excel = ep.Excel(
+        path=io.BytesIO(),
+        sheets=[
+            ep.Sheet(
+                name="S",
+                components=[
+                    ep.Table(data=sample_df, column_style={"testing": blocking}),
+                    ep.Table(
+                        data=sample_df,
+                        column_style={"testing": lambda v: later_calls.append(v)},
+                    ),
+                ],
+            )
+        ],
+    )
+
+    async def cancel_mid_render():
+        task = asyncio.create_task(ep.save_async(excel))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+        task.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel_mid_render())
+    assert later_calls == []
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
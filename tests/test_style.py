@@ -0,0 +1,105 @@
+import io
+import logging
+import os
+import pickle
+import subprocess
+import sys
+
+import pytest
+import xlsxwriter
+
+import excelipy as ep
+from excelipy.style import StyleRegistry
+
+
+def _pydantic_merge(base: ep.Style, other: ep.Style) -> ep.Style:
+    merged = base.model_dump(exclude_none=True)
+    merged.update(other.model_dump(exclude_none=True))
+    return ep.Style.model_validate(merged)
+
+
+@pytest.mark.parametrize(
+    "base, other",
+    [
+        (ep.Style(), ep.Style()),
+        (ep.Style(font_size=11, bold=True), ep.Style()),
+        (ep.Style(), ep.Style(background="#ffffff")),
+        (ep.Style(font_size=11, bold=True), ep.Style(font_size=14, bold=False)),
+        (ep.Style(numeric_format=".2f", fill_na="-"), ep.Style(fill_na=0)),
+    ],
+)
+def test_merge_matches_validated_merge(base: ep.Style, other: ep.Style):
+    merged = base.merge(other)
+    expected = _pydantic_merge(base, other)
+    assert merged == expected
+    assert hash(merged) == hash(expected)
+    assert merged.model_dump() == expected.model_dump()
+    assert str(merged) == str(expected)
+
+
+def test_model_copy_refreshes_core():
+    style = ep.Style(font_size=11)
+    assert hash(style) == hash(ep.Style(font_size=11))
+    copied = style.model_copy(update=dict(font_size=14))
+    assert copied == ep.Style(font_size=14)
+    assert copied != style
+
+
+def test_formats_shared_by_effective_properties():
+    registry = StyleRegistry(xlsxwriter.Workbook(io.BytesIO()))
+    styles = [
+        ep.Style(bold=True, numeric_format=".2f"),
+        ep.Style(bold=True, numeric_format="0.00", fill_na="-"),
+        ep.Style(bold=True, numeric_format=".2f", padding=3),
+    ]
+    formats = {id(registry.format(registry.intern(style))) for style in styles}
+    assert len(formats) == 1
+    assert registry.formats_created == 1
+
+
+@pytest.mark.parametrize("fallback", [False, True])
+def test_format_budget(fallback: bool, caplog: pytest.LogCaptureFixture):
+    workbook = xlsxwriter.Workbook(io.BytesIO())
+    registry = StyleRegistry(workbook, format_budget=2, budget_fallback=fallback)
+    sizes = [10, 11, 12, 13]
+    with caplog.at_level(logging.WARNING, logger="excelipy"):
+        formats = [
+            registry.format(
+                registry.intern(ep.Style(font_size=size, numeric_format="0%"))
+            )
+            for size in sizes
+        ]
+    assert len(caplog.records) == 1
+    assert registry.formats_over_budget == 2
+    if fallback:
+        assert (registry.formats_created, registry.formats_fallback) == (2, 1)
+        assert formats[2] is formats[3]
+        assert formats[3].num_format == "0%" and formats[3].font_size == 11
+    else:
+        assert (registry.formats_created, registry.formats_fallback) == (4, 0)
+        assert [f.font_size for f in formats] == sizes
+
+
+def test_style_hash_survives_other_process():
+    style = ep.Style(font_family="Arial", numeric_format=".2f", bold=True)
+    assert hash(style) == hash(style.core)
+    code = (
+        "import pickle, sys\n"
+        "import excelipy as ep\n"
+        "style = pickle.load(sys.stdin.buffer)\n"
+        "fresh = ep.Style(font_family='Arial', numeric_format='.2f', bold=True)\n"
+        "assert style == fresh and hash(style) == hash(fresh), 'unequal'\n"
+        "assert {fresh: 1}[style] == 1\n"
+    )
+    # A fixed seed other than this process's, so string hashes differ
+    seed = "1" if os.environ.get("PYTHONHASHSEED") != "1" else "2"
+    subprocess.run(
+        [sys.executable, "-c", code],
+        input=pickle.dumps(style),
+        env={**os.environ, "PYTHONHASHSEED": seed},
+        check=True,
+    )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,547 @@
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+import xlsxwriter
+
+import excelipy as ep
+from excelipy.sizing import get_text_size
+from excelipy.sources import FileSource
+from excelipy.writers import table as table_writer
+from excelipy.writers.table import write_table
+
+
+@pytest.fixture
+def mixed_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "ints": [1, 2, 3],
+            "flags": [True, False, True],
+            "names": ["Yay", "Thanks", "Bud"],
+        }
+    )
+
+
+def _write(component: ep.Table):
+    workbook = xlsxwriter.Workbook(io.BytesIO())
+    worksheet = workbook.add_worksheet()
+    write_table(workbook, worksheet, component, ep.Style())
+    return workbook, worksheet
+
+
+def test_static_columns_share_one_format(mixed_df: pd.DataFrame):
+    workbook, worksheet = _write(ep.Table(data=mixed_df))
+    for col_idx in range(mixed_df.shape[1]):
+        formats = {id(worksheet.table[row][col_idx].format) for row in (1, 2, 3)}
+        assert len(formats) == 1
+    assert worksheet.table[1][0].number == 1
+    assert not worksheet.table[2][1].boolean
+    workbook.close()
+
+
+def test_static_and_dynamic_columns_match(mixed_df: pd.DataFrame):
+    static_wb, static_ws = _write(ep.Table(data=mixed_df))
+    dynamic_wb, dynamic_ws = _write(
+        ep.Table(data=mixed_df, column_style={"ints": lambda _: ep.Style()})
+    )
+    for row in (1, 2, 3):
+        static_cell = static_ws.table[row][0]
+        dynamic_cell = dynamic_ws.table[row][0]
+        assert static_cell.number == dynamic_cell.number
+    assert getattr(static_ws, "_excelipy_col_sizes") == getattr(
+        dynamic_ws, "_excelipy_col_sizes"
+    )
+    static_wb.close()
+    dynamic_wb.close()
+
+
+def test_vectorized_style_matches_per_cell(mixed_df: pd.DataFrame):
+    highlight = ep.Style(bold=True, font_size=14)
+
+    def per_cell(value) -> ep.Style:
+        return highlight if value > 1 else ep.Style()
+
+    @ep.vectorized
+    def per_column(col: pd.Series):
+        return [highlight if value > 1 else None for value in col]
+
+    @ep.vectorized
+    @ep.row_wise
+    def per_frame(df: pd.DataFrame):
+        return pd.Categorical.from_codes(np.where(df["ints"] > 1, 0, -1), [highlight])
+
+    results = [
+        _write(ep.Table(data=mixed_df, column_style={"ints": func}))
+        for func in (per_cell, per_column, per_frame)
+    ]
+    for row in (1, 2, 3):
+        formats = {ws.table[row][0].format.bold for _, ws in results}
+        assert len(formats) == 1
+    sizes = [getattr(ws, "_excelipy_col_sizes") for _, ws in results]
+    assert sizes[0] == sizes[1] == sizes[2]
+    for wb, _ in results:
+        wb.close()
+
+
+def test_typed_column_values():
+    df = pd.DataFrame(
+        {
+            "ints": [1, 2],
+            "floats": [0.5, 1.5],
+            "dates": pd.to_datetime(["2024-01-31", None]),
+        }
+    )
+    workbook, worksheet = _write(
+        ep.Table(data=df, column_style={"floats": lambda _: ep.Style(bold=True)})
+    )
+    assert worksheet.table[1][0].number == 1
+    assert isinstance(worksheet.table[1][0].number, int)
+    assert worksheet.table[2][1].number == 1.5
+    assert type(worksheet.table[1][2]).__name__ == "Datetime"
+    assert type(worksheet.table[2][2]).__name__ == "Blank"
+    workbook.close()
+
+
+def test_fill_substitutions():
+    df = pd.DataFrame({"a": [1.5, np.nan, 0.0, np.inf, np.nan], "b": [1, 2, 3, 4, 5]})
+    fills = ep.Style(
+        fill_na="-", fill_zero="zero", fill_inf="inf", numeric_format=".2f"
+    )
+    workbook, worksheet = _write(
+        ep.Table(data=df, style=fills, row_style={4: ep.Style(fill_na="row")})
+    )
+    assert worksheet.table[1][0].number == 1.5
+    assert worksheet.table[1][0].format.num_format == "0.00"
+    for row, text in ((2, "-"), (3, "zero"), (4, "inf"), (5, "row")):
+        cell = worksheet.table[row][0]
+        assert workbook.str_table.string_table[text] == cell.string
+        assert cell.format.num_format == "General"
+    workbook.close()
+
+
+def _cells(workbook, worksheet) -> dict:
+    strings = {idx: text for text, idx in workbook.str_table.string_table.items()}
+    return {
+        (row, col): (
+            strings[cell.string]
+            if type(cell).__name__ == "String"
+            else None
+            if type(cell).__name__ == "Blank"
+            else cell[0],
+            cell.format.bold,
+            cell.format.num_format,
+        )
+        for row, cols in worksheet.table.items()
+        for col, cell in cols.items()
+    }
+
+
+@pytest.fixture
+def chunked_table_options() -> dict:
+    return dict(
+        row_style={3: ep.Style(bold=True), 7: ep.Style(italic=True)},
+        column_style={"floats": ep.Style(fill_na="-")},
+        idx_column_style={0: lambda v: ep.Style(bold=v > 4)},
+    )
+
+
+@pytest.fixture
+def chunked_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "ints": range(10),
+            "texts": [f"row {i}" * (i % 4) for i in range(10)],
+            "floats": [0.5, np.nan] * 5,
+        }
+    )
+
+
+def test_chunked_source_matches_frame(
+    chunked_df: pd.DataFrame, chunked_table_options: dict
+):
+    chunks = (chunked_df.iloc[beg : beg + 4] for beg in range(0, 10, 4))
+    chunked_wb, chunked_ws = _write(ep.Table(data=chunks, **chunked_table_options))
+    frame_wb, frame_ws = _write(ep.Table(data=chunked_df, **chunked_table_options))
+    assert _cells(chunked_wb, chunked_ws) == _cells(frame_wb, frame_ws)
+    assert getattr(chunked_ws, "_excelipy_col_sizes") == getattr(
+        frame_ws, "_excelipy_col_sizes"
+    )
+    chunked_wb.close()
+    frame_wb.close()
+
+
+def test_chunked_source_constant_memory(
+    chunked_df: pd.DataFrame, chunked_table_options: dict
+):
+    def save(data) -> dict[str, bytes]:
+        out = io.BytesIO()
+        table = ep.Table(data=data, **chunked_table_options)
+        sheet = ep.Sheet(name="S", components=[table, ep.Text(text="After")])
+        ep.save(ep.Excel(path=out, sheets=[sheet], constant_memory=True))
+        with zipfile.ZipFile(out) as zf:
+            return {n: zf.read(n) for n in zf.namelist() if "docProps" not in n}
+
+    chunks = (chunked_df.iloc[beg : beg + 4] for beg in range(0, 10, 4))
+    assert save(chunks) == save(chunked_df)
+
+
+def test_chunked_source_rejects_mismatched_columns():
+    chunks = iter([pd.DataFrame({"a": [1]}), pd.DataFrame({"b": [2]})])
+    with pytest.raises(ValueError):
+        _write(ep.Table(data=chunks))
+
+
+def test_arrow_data():
+    pa = pytest.importorskip("pyarrow")
+    arrow = pa.table(
+        {
+            "ints": [1, None, 3],
+            "flags": [True, None, False],
+            "floats": [0.5, float("inf"), None],
+        }
+    )
+    options = dict(
+        column_style={"floats": ep.Style(fill_na="-", fill_inf="inf")},
+        idx_column_style={1: ep.Style(fill_inf="never")},
+    )
+    table = ep.Table(data=arrow, **options)
+    assert isinstance(table.data["ints"].dtype, pd.ArrowDtype)
+    workbook, worksheet = _write(table)
+    strings = {idx: text for text, idx in workbook.str_table.string_table.items()}
+    assert worksheet.table[1][0].number == 1
+    assert type(worksheet.table[2][0]).__name__ == "Blank"
+    assert worksheet.table[1][1].boolean
+    assert type(worksheet.table[2][1]).__name__ == "Blank"
+    assert strings[worksheet.table[2][2].string] == "inf"
+    assert strings[worksheet.table[3][2].string] == "-"
+    workbook.close()
+
+    batches = pa.RecordBatchReader.from_batches(arrow.schema, arrow.to_batches(2))
+    streamed_wb, streamed_ws = _write(ep.Table(data=batches, **options))
+    assert worksheet.table.keys() == streamed_ws.table.keys()
+    streamed_wb.close()
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather"])
+def test_file_source(tmp_path, chunked_df: pd.DataFrame, suffix: str):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / f"data{suffix}"
+    getattr(chunked_df, f"to_{suffix[1:]}")(path)
+    table = ep.Table(
+        data={"path": str(path), "columns": ["floats", "ints"], "offset": 3},
+        style=ep.Style(fill_na="-"),
+    )
+    table.data.batch_size = 4
+    assert table.data.num_rows == 7
+    assert ep.Table.model_validate(table.model_dump()).data.to_spec() == (
+        table.data.to_spec()
+    )
+    expected = chunked_df[["floats", "ints"]].iloc[3:].reset_index(drop=True)
+    file_wb, file_ws = _write(table)
+    frame_wb, frame_ws = _write(table.model_copy(update={"data": expected}))
+    assert _cells(file_wb, file_ws) == _cells(frame_wb, frame_ws)
+    file_wb.close()
+    frame_wb.close()
+
+    limited = ep.Table(data=FileSource(path, offset=3, limit=5, batch_size=4))
+    assert sum(len(chunk) for chunk in limited.data.chunks()) == 5
+
+
+def test_file_source_skips_row_groups(tmp_path, chunked_df: pd.DataFrame):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "data.parquet"
+    chunked_df.to_parquet(path, row_group_size=3)
+    source = FileSource(path, offset=7, limit=2, batch_size=4)
+    dataset, skip = source._skip_row_groups(source._dataset())
+    # Row groups of rows 0-2 and 3-5 are left out, row 6 is skipped by slicing
+    kept = [fragment.row_groups[0].id for fragment in dataset.get_fragments()]
+    assert kept == [2, 3] and skip == 1
+    chunks = list(source.chunks())
+    assert pd.concat(chunks)["ints"].tolist() == [7, 8]
+
+
+def test_duckdb_relation():
+    duckdb = pytest.importorskip("duckdb")
+    relation = duckdb.sql("select range as n, range * 0.5 as half from range(5)")
+    workbook, worksheet = _write(ep.Table(data=relation))
+    assert worksheet.table[5][0].number == 4
+    assert worksheet.table[5][1].number == 2
+    workbook.close()
+
+
+def test_sampled_auto_size(monkeypatch: pytest.MonkeyPatch):
+    df = pd.DataFrame({"text": ["short"] * 5_000 + ["a much much longer text"]})
+    measured = []
+    get_text_sizes = table_writer.get_text_sizes
+
+    def counting_get_text_sizes(texts, *args):
+        measured.append(len(texts))
+        return get_text_sizes(texts, *args)
+
+    monkeypatch.setattr(table_writer, "get_text_sizes", counting_get_text_sizes)
+    full_wb, full_ws = _write(ep.Table(data=df))
+    sampled_wb, sampled_ws = _write(ep.Table(data=df, auto_size_sample_threshold=1_000))
+
+    assert measured[1] < measured[0] / 10
+    assert getattr(full_ws, "_excelipy_col_sizes") == getattr(
+        sampled_ws, "_excelipy_col_sizes"
+    )
+    full_wb.close()
+    sampled_wb.close()
+
+
+def test_sampled_auto_size_blocks(monkeypatch: pytest.MonkeyPatch):
+    texts = [f"row {i}" for i in range(5_000)]
+    texts[4_321] = "a much much longer text"
+    df = pd.DataFrame({"text": texts, "ratios": np.arange(5_000) / 7})
+    full_wb, full_ws = _write(ep.Table(data=df))
+
+    kept = []
+    keep_candidates = table_writer._ColumnMeasure._keep_candidates
+
+    def counting_keep_candidates(self, rows, *args):
+        if len(rows):
+            kept.append(len(self._longest) + len(self._picked))
+        return keep_candidates(self, rows, *args)
+
+    monkeypatch.setattr(
+        table_writer._ColumnMeasure, "_keep_candidates", counting_keep_candidates
+    )
+    monkeypatch.setattr(table_writer, "CONSTANT_MEMORY_BLOCK_ROWS", 300)
+    workbook = xlsxwriter.Workbook(io.BytesIO(), {"constant_memory": True})
+    worksheet = workbook.add_worksheet()
+    table = ep.Table(data=df, auto_size_sample_threshold=1_000)
+    write_table(workbook, worksheet, table, ep.Style())
+
+    # Candidates are all that is kept between blocks, and typed cells skip them
+    assert len(kept) == 17
+    assert max(kept) <= table_writer.SAMPLE_TOP_K + table_writer.SAMPLE_RANDOM
+    assert getattr(full_ws, "_excelipy_col_sizes") == getattr(
+        worksheet, "_excelipy_col_sizes"
+    )
+    full_wb.close()
+    workbook.close()
+
+
+def test_constant_memory_blocks(
+    monkeypatch: pytest.MonkeyPatch,
+    chunked_df: pd.DataFrame,
+    chunked_table_options: dict,
+):
+    @ep.row_wise
+    def big_row(row) -> ep.Style:
+        return ep.Style(bold=row[0] > 6)
+
+    def save() -> dict[str, bytes]:
+        out = io.BytesIO()
+        options = dict(chunked_table_options, wrap_header=True)
+        options["idx_column_style"] = {**options["idx_column_style"], 1: big_row}
+        table = ep.Table(data=chunked_df, **options)
+        sheet = ep.Sheet(name="S", components=[table])
+        ep.save(ep.Excel(path=out, sheets=[sheet], constant_memory=True))
+        with zipfile.ZipFile(out) as zf:
+            return {n: zf.read(n) for n in zf.namelist() if "docProps" not in n}
+
+    whole = save()
+    # Blocks ending mid-table and between styled rows
+    monkeypatch.setattr(table_writer, "CONSTANT_MEMORY_BLOCK_ROWS", 3)
+    assert save() == whole
+
+
+def test_body_row_heights_match_per_row():
+    rng = np.random.default_rng(0)
+    num_cols, num_rows = 4, 2_000
+    sizes = rng.integers(0, 60, (num_cols, num_rows))
+    # Ratios right at a half tenth, which rounding must treat like round()
+    sizes[0, :3] = [21, 63, 105]
+    fonts = [None, 14, None, 9]
+    font_rows = rng.choice([11, 14, None], num_rows).tolist()
+    col_sizes = {2: 20, 3: 35, 4: 12, 5: 28}
+    origin = (2, 0)
+
+    body = table_writer._BodySizes(num_cols, num_rows)
+    for col_idx, font in enumerate(fonts):
+        body.set_column(col_idx, sizes[col_idx], font_rows if col_idx == 1 else font)
+    rows, heights = body.row_heights(col_sizes, origin)
+
+    expected = {}
+    for row_idx in range(num_rows):
+        height = table_writer._body_row_height(
+            (
+                (
+                    col,
+                    (
+                        int(sizes[col, row_idx]),
+                        font_rows[row_idx] if col == 1 else font,
+                    ),
+                )
+                for col, font in enumerate(fonts)
+            ),
+            col_sizes,
+            origin,
+        )
+        if height is not None:
+            expected[row_idx] = height
+    assert dict(zip(rows.tolist(), heights.tolist())) == expected
+    assert body.sizes.dtype == np.int32 and body.font_codes.dtype == np.uint8
+
+
+@pytest.mark.parametrize("wrap_header", [False, True])
+def test_constant_memory_styles_once(
+    monkeypatch: pytest.MonkeyPatch, wrap_header: bool
+):
+    df = pd.DataFrame({"values": range(1_000), "names": ["name"] * 1_000})
+    calls = []
+
+    def count_style(value) -> ep.Style:
+        calls.append(value)
+        return ep.Style(bold=value % 2 == 0)
+
+    def write(constant_memory: bool):
+        workbook = xlsxwriter.Workbook(
+            io.BytesIO(), {"constant_memory": constant_memory}
+        )
+        worksheet = workbook.add_worksheet()
+        table = ep.Table(
+            data=df, column_style={"values": count_style}, wrap_header=wrap_header
+        )
+        write_table(workbook, worksheet, table, ep.Style())
+        return workbook, worksheet
+
+    monkeypatch.setattr(table_writer, "CONSTANT_MEMORY_BLOCK_ROWS", 300)
+    workbook, worksheet = write(constant_memory=True)
+    assert calls == list(range(1_000))
+    expected_wb, expected_ws = write(constant_memory=False)
+    assert getattr(worksheet, "_excelipy_col_sizes") == getattr(
+        expected_ws, "_excelipy_col_sizes"
+    )
+    workbook.close()
+    expected_wb.close()
+
+
+def test_constant_memory_row_heights(monkeypatch: pytest.MonkeyPatch):
+    df = pd.DataFrame(
+        {
+            "names": ["short", "a much longer name " * 4, "mid sized name"] * 2,
+            "notes": ["avocado toast " * (i % 3 + 1) for i in range(6)],
+        }
+    )
+
+    def write(constant_memory: bool) -> dict:
+        workbook = xlsxwriter.Workbook(
+            io.BytesIO(), {"constant_memory": constant_memory}
+        )
+        worksheet = workbook.add_worksheet()
+        table = ep.Table(
+            data=df,
+            column_style={"notes": lambda v: ep.Style(bold=len(v) > 20)},
+            row_style={1: ep.Style(font_size=14)},
+            max_col_size=20,
+            wrap_header=True,
+        )
+        write_table(workbook, worksheet, table, ep.Style())
+        workbook.close()
+        return {row: info[0] for row, info in worksheet.set_rows.items()}
+
+    measured = []
+    get_size = table_writer.get_text_size
+    monkeypatch.setattr(
+        table_writer,
+        "get_text_size",
+        lambda text, *args: measured.append(text) or get_size(text, *args),
+    )
+    heights = write(constant_memory=True)
+    # Body cells are measured once per column, for both widths and heights
+    assert not set(measured) & set(df.to_numpy().ravel())
+    assert len(heights) > 1 and heights == write(constant_memory=False)
+
+
+def test_typed_columns_sized_from_numeric_format(monkeypatch: pytest.MonkeyPatch):
+    def no_text_measurement(*args, **kwargs):
+        raise AssertionError("typed columns must not be measured as text")
+
+    monkeypatch.setattr(table_writer, "_measure_column", no_text_measurement)
+    df = pd.DataFrame(
+        {
+            "a": [1234567.891, -2.5, 3.0],
+            "b": pd.to_datetime(["2024-09-05", "2024-01-01", None]),
+            "c": [1, 22, 333],
+        }
+    )
+    column_style = {
+        "a": ep.Style(numeric_format=",.2f"),
+        "b": ep.Style(numeric_format="%d %B %Y"),
+    }
+    workbook, worksheet = _write(
+        ep.Table(data=df, column_style=column_style, default_style=False)
+    )
+    col_sizes = getattr(worksheet, "_excelipy_col_sizes")
+    assert col_sizes[0] == get_text_size("1,234,567.89")
+    assert col_sizes[1] == get_text_size("05 September 2024")
+    assert col_sizes[2] == get_text_size("333")
+    workbook.close()
+
+
+def test_constant_memory_typed_row_heights():
+    df = pd.DataFrame(
+        {
+            "ratios": [1 / 3, 2 / 3, 1.0],
+            "dates": pd.to_datetime(
+                ["2024-09-05 13:07", "2024-01-01 00:00", "2024-12-31 08:30"]
+            ),
+        }
+    )
+    column_style = {
+        "ratios": ep.Style(numeric_format=".2f"),
+        "dates": ep.Style(numeric_format="%d/%m/%Y"),
+    }
+
+    def write(constant_memory: bool) -> dict:
+        workbook = xlsxwriter.Workbook(
+            io.BytesIO(), {"constant_memory": constant_memory}
+        )
+        worksheet = workbook.add_worksheet()
+        table = ep.Table(data=df, column_style=column_style, wrap_header=True)
+        write_table(workbook, worksheet, table, ep.Style())
+        workbook.close()
+        return worksheet.set_rows
+
+    # Rows are sized as Excel shows the values, not from str(value)
+    assert write(constant_memory=True) == write(constant_memory=False) == {}
+
+
+@pytest.mark.parametrize("constant_memory", [False, True])
+def test_typed_columns_sized_through_row_styles(constant_memory: bool):
+    df = pd.DataFrame(
+        {
+            "ratios": [1 / 3, 2 / 3, 1234.5, np.nan],
+            "dates": pd.to_datetime(["2024-09-05", "2024-01-01", None, "2024-12-31"]),
+        }
+    )
+    column_style = {
+        "ratios": ep.Style(numeric_format=",.2f", fill_na="-"),
+        "dates": ep.Style(numeric_format="%d/%m/%Y"),
+    }
+
+    def col_sizes(**options) -> dict:
+        options["column_style"] = {**column_style, **options.get("column_style", {})}
+        workbook = xlsxwriter.Workbook(
+            io.BytesIO(), {"constant_memory": constant_memory}
+        )
+        worksheet = workbook.add_worksheet()
+        write_table(workbook, worksheet, ep.Table(data=df, **options), ep.Style())
+        workbook.close()
+        return dict(getattr(worksheet, "_excelipy_col_sizes"))
+
+    plain = col_sizes()
+    assert plain[0] == get_text_size("1,234.50")
+    striped = ep.Table(data=df, column_style=column_style).with_stripes()
+    assert col_sizes(row_style=striped.row_style) == plain
+    bold = {"dates": lambda _: ep.Style(bold=True, numeric_format="%d/%m/%Y")}
+    assert col_sizes(column_style=bold) == plain
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])